@@ -1,17 +1,40 @@
-import os
-import re
-import sys
-
-from tqdm import tqdm
-from typing import Iterable, Literal, Union
+"""Tools for IRBIS/RUSMarc exports. Nothing is imported here:
+every module (and its dependencies) is loaded only when it is used,
+which keeps `python -m irma <command>` quick to start.
+"""
 
 __all__ = [
     'batch_open_urls',
+    'benchmark',
+    'bytes_filter',
+    'cli',
+    'corpus',
+    'dedup',
+    'external_sort',
+    'field_index',
     'files_together',
     'get_text',
+    'link_cache',
+    'link_checker',
+    'metrics',
+    'page_markers',
+    'pipeline',
+    'record',
+    'record_diff',
+    'record_file',
     'remove_fields',
+    'render_pool',
     'select_records',
+    'shards',
     'sorting',
-    'tidy'
+    'tidy',
+    'url_extract'
     ]
 
+
+def __getattr__(name):
+    # irma.tqdm used to be imported here for the other modules
+    if name == 'tqdm':
+        from tqdm import tqdm
+        return tqdm
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,12 @@
-import re
 import webbrowser
 from os import PathLike
 from urllib.request import urlopen, Request
 from urllib.error import HTTPError, URLError
-from pathlib import Path
 from typing import Literal
 
-from irma import tqdm
+from tqdm import tqdm
+from irma.link_checker import LinkResult, broken, check_links
+from irma.url_extract import extract
 
 def check_url(url: str) -> None:
     """Check if URL is accessible, print broken links."""
@@ -18,30 +18,33 @@ def check_url(url: str) -> None:
     except (HTTPError, URLError) as e:
         print(f"Broken: {url} ({str(e)})")
 
-def urls(mode: Literal['open', 'check'], file: PathLike) -> None:
+def urls(mode: Literal['open', 'check'], file: PathLike, **options) -> list[LinkResult] | None:
     """Extract web links from text file and either:
     - Open them in browser tabs ('open' mode), or
-    - Check for dead links ('check' mode)
+    - Check for dead links ('check' mode): all links are checked concurrently
+      (options go to link_checker.LinkChecker), results are returned
+    The file is read line by line and every link is handled once,
+    however many times (and spellings) it occurs.
     """
-    # Read file content
-    text = Path(file).read_text(encoding='utf-8')
-    
-    # Improved URL regex (handles more cases)
-    url_pattern = re.compile(
-        r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[/?#][-\w./?%&=:#@]*'
-    )
-    found_urls = url_pattern.findall(text)
+    found_urls = extract(file, by='lines')
     
     if not found_urls:
         print("No URLs found in file.")
         return
+    print(f'{len(found_urls)} unique links out of {found_urls.found} found.')
+
+    if mode == 'check':
+        results = check_links(found_urls, **options)
+        for result in broken(results):
+            lines = ', '.join(str(n + 1) for n in found_urls.records(result.url))
+            print(f"Broken: {result.url} ({result.error or f'Status: {result.status}'}) "
+                  f"on lines {lines}")
+        return results
 
     # Process URLs based on mode
     for url in tqdm(found_urls, desc='Handling URLs'):
         if mode == 'open':
             webbrowser.open(url, new=2, autoraise=True)
-        elif mode == 'check':
-            check_url(url)
 
 # Example usage:
 # urls('open', 'links.txt')  # Opens all links in browser
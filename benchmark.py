@@ -0,0 +1,215 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import corpus, get_text, marc_to_irbis
+from .external_sort import sort_records
+from .select_records import select_file, select_records
+from .sorting import sort_one
+from .tidy import tidy_text
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+SIZES = (10_000, 100_000, 1_000_000)
+TERMS = ['экономика', 'Лань', ('история', 'россии')]
+
+
+# ===== Hot paths =====
+# Each one gets the corpus file and returns the number of records it went through
+def _outof(path: Path) -> int:
+    return sum(1 for _ in get_text.outof(path, 'iter records'))
+
+
+def _outof_to_records(path: Path) -> int:
+    return len(get_text.outof(path, 'to records'))
+
+
+def _convert(path: Path) -> int:
+    return marc_to_irbis.convert(path.read_text(encoding='utf-8')).count('\n*****\n')
+
+
+def _iter_convert(path: Path) -> int:
+    return sum(1 for _ in marc_to_irbis.iter_convert(path))
+
+
+def _tidy_text(path: Path) -> int:
+    records = 0
+    with open(path, encoding='utf-8') as f:
+        for chunk in get_text.iter_record_chunks(f):
+            records += tidy_text(chunk).count(get_text.RECORD_SEPARATOR)
+    return records
+
+
+def _select_records(path: Path) -> int:
+    records = get_text.outof(path, 'to records')
+    select_records(records, 'with', TERMS)
+    return len(records)
+
+
+def _select_file(path: Path) -> int:
+    select_file(path, 'with', TERMS, path.with_suffix('.selected'))
+    return _count(path)
+
+
+def _sort_records(path: Path) -> int:
+    return sum(1 for _ in sort_records(get_text.outof(path, 'iter records')))
+
+
+def _sort_one(path: Path) -> int:
+    sort_one(path)
+    return _count(path)
+
+
+def _count(path: Path) -> int:
+    with open(path, 'rb') as f:
+        return sum(1 for _ in get_text.iter_raw_records(f)) - 1
+
+
+# name: (corpus format, hot path)
+CASES: Dict[str, Tuple[str, Callable[[Path], int]]] = {
+    'outof': ('txt', _outof),
+    'outof to records': ('txt', _outof_to_records),
+    'convert': ('xml', _convert),
+    'iter_convert': ('xml', _iter_convert),
+    'tidy_text': ('txt', _tidy_text),
+    'select_records': ('txt', _select_records),
+    'select_file': ('txt', _select_file),
+    'sort_records': ('txt', _sort_records),
+    'sort_one': ('txt', _sort_one),
+}
+
+
+# ===== Measuring =====
+def peak_rss() -> Optional[float]:
+    """Peak resident memory of this process in MB (None where unknown)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure(case: str, path: str) -> Tuple[int, float, Optional[float]]:
+    """Run in a fresh process, so peak RSS belongs to this case only."""
+    start = time.perf_counter()
+    records = CASES[case][1](Path(path))
+    return records, time.perf_counter() - start, peak_rss()
+
+
+def corpus_file(workdir: Path, size: int, kind: str, duplicates: float, seed: int) -> Path:
+    """Generated once per size and options, then reused."""
+    path = workdir / f'corpus_{size}_{seed}_{duplicates}_v{corpus.VERSION}.{kind}'
+    if not path.exists():
+        write = corpus.write_marcxml if kind == 'xml' else corpus.write_irbis
+        write(path, size, duplicates=duplicates, seed=seed)
+    return path
+
+
+def run(
+    cases: List[str],
+    sizes: List[int],
+    workdir: Path,
+    duplicates: float = corpus.DUPLICATION_RATE,
+    seed: int = 1,
+) -> List[dict]:
+    workdir.mkdir(parents=True, exist_ok=True)
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for size in sizes:
+        for case in cases:
+            path = corpus_file(workdir, size, CASES[case][0], duplicates, seed)
+            megabytes = path.stat().st_size / 1e6
+            with context.Pool(1) as pool:
+                records, seconds, peak = pool.apply(_measure, (case, str(path)))
+            result = {
+                'case': case,
+                'size': size,
+                'records': records,
+                'seconds': round(seconds, 4),
+                'records_per_sec': round(records / seconds, 1),
+                'mb_per_sec': round(megabytes / seconds, 2),
+                'input_mb': round(megabytes, 2),
+                'peak_rss_mb': None if peak is None else round(peak, 1),
+            }
+            print(f"{case:<18}{size:>10}{result['records_per_sec']:>14}"
+                  f"{result['mb_per_sec']:>10}{str(result['peak_rss_mb']):>10}")
+            results.append(result)
+    return results
+
+
+def check_convert(workdir: Path, size: int, duplicates: float, seed: int) -> int:
+    """Lines where the streaming parser and the regexes convert the corpus differently."""
+    path = corpus_file(workdir, size, 'xml', duplicates, seed)
+    found = marc_to_irbis.differences(path.read_text(encoding='utf-8'))
+    for old, new in found[:5]:
+        print(f'regexes:   {old}\nstreaming: {new}')
+    print(f'convert paths differ on {len(found)} lines of {size} records')
+    return len(found)
+
+
+def save(results: List[dict], output: Path, label: str = '', convert_differences: int = 0) -> None:
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'label': label,
+            'convert_differences': convert_differences,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'results': results,
+        }, f, ensure_ascii=False, indent=1)
+
+
+def compare(old: Path, new: Path) -> None:
+    """Print the records/sec ratio of new to old for every case and size in both."""
+    with open(old, encoding='utf-8') as f:
+        before = {(r['case'], r['size']): r for r in json.load(f)['results']}
+    with open(new, encoding='utf-8') as f:
+        after = json.load(f)['results']
+    for result in after:
+        previous = before.get((result['case'], result['size']))
+        if previous:
+            ratio = result['records_per_sec'] / previous['records_per_sec']
+            print(f"{result['case']:<18}{result['size']:>10}{ratio:>10.2f}x")
+
+
+# ===== Command line =====
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='irma bench',
+        description='Time the record-processing hot paths on generated corpora.'
+    )
+    parser.add_argument('-o', '--output', default='bench.json', help='JSON file for the results')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(SIZES))
+    parser.add_argument('--workdir', default='bench_corpus', help='where corpora are generated')
+    parser.add_argument('--duplicates', type=float, default=corpus.DUPLICATION_RATE,
+                        help='share of duplicated records')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--label', default='', help='e.g. a version, saved with the results')
+    parser.add_argument('--compare', metavar='OLD', help='earlier results to compare with')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    Path(args.workdir).mkdir(parents=True, exist_ok=True)
+    different = check_convert(Path(args.workdir), min(args.sizes), args.duplicates, args.seed)
+    print(f"{'case':<18}{'records':>10}{'records/s':>14}{'MB/s':>10}{'peak MB':>10}")
+    results = run(args.cases, args.sizes, Path(args.workdir), args.duplicates, args.seed)
+    save(results, Path(args.output), args.label, different)
+    if args.compare:
+        compare(Path(args.compare), Path(args.output))
+
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    main()
@@ -0,0 +1,146 @@
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Union
+
+from .files_together import BUFFER_SIZE
+
+
+ENCODINGS = ('utf-8', 'cp1251')  # our exports are in one or the other
+SEPARATOR_LINE = re.compile(rb'^\*{5}[^\n]*(?:\n|\Z)', re.M)
+
+
+def map_file(f) -> Union[mmap.mmap, bytes]:
+    """Read-only mmap of an open file, b'' for an empty one (mmap can't map those).
+    Close it with close_map.
+    """
+    if not os.fstat(f.fileno()).st_size:
+        return b''
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def close_map(mm: Union[mmap.mmap, bytes]) -> None:
+    if isinstance(mm, mmap.mmap):
+        mm.close()
+
+
+@contextmanager
+def mapped(file: Union[os.PathLike, str]) -> Iterator[Union[mmap.mmap, bytes]]:
+    """map_file for a path."""
+    with open(file, 'rb') as f:
+        mm = map_file(f)
+        try:
+            yield mm
+        finally:
+            close_map(mm)
+
+
+def encode_terms(terms: Iterable, encodings: Iterable[str] = ENCODINGS) -> list:
+    """Search terms (strings or groups of strings) as bytes, once per encoding,
+    so the same terms find records in a file of any of them, even a mixed one.
+    Cyrillic in cp1251 is never valid UTF-8 and the other way round
+    is unlikely enough, so the extra spellings don't match by accident.
+    A term that an encoding can't represent is left out in that encoding.
+    """
+    terms, encoded = list(terms), []
+    for encoding in encodings:
+        for term in terms:
+            try:
+                if isinstance(term, str):
+                    term = term.encode(encoding)
+                else:
+                    term = tuple(elem.encode(encoding) for elem in term)
+            except UnicodeEncodeError:
+                continue
+            if term not in encoded:
+                encoded.append(term)
+    return encoded
+
+
+TAG_PREFIX = re.compile(r'#0*(\d+):')
+
+
+def _prefix_pattern(prefix: str) -> bytes:
+    """A tag prefix matches with or without leading zeros ('#010:' finds '#10:'),
+    as record.normalize_tag has it. Anything else is matched literally.
+    """
+    tag = TAG_PREFIX.fullmatch(prefix)
+    if tag:
+        return b'#0*' + tag.group(1).encode() + b':'
+    return re.escape(prefix.encode('utf-8'))
+
+
+def line_pattern(prefixes: Iterable[str]) -> re.Pattern:
+    """Whole lines (with their line break) starting with any of prefixes.
+    Prefixes are tags like '#001:', so they are the same in cp1251 and UTF-8.
+    """
+    alternatives = b'|'.join(_prefix_pattern(prefix) for prefix in prefixes)
+    return re.compile(rb'^(?:' + alternatives + rb')[^\n]*(?:\n|\Z)', re.M)
+
+
+def _kept_lines(data, pattern: re.Pattern) -> Iterator[Tuple[int, int]]:
+    """(start, end) of the stretches between matching lines."""
+    start = 0
+    for match in pattern.finditer(data):
+        if match.start() > start:
+            yield start, match.start()
+        start = match.end()
+    if start < len(data):
+        yield start, len(data)
+
+
+def record_spans(data) -> Iterator[Tuple[int, int, int]]:
+    """(start, end, next) of every record: data[start:end] is the record,
+    data[start:next] is the record with its separator line.
+    """
+    start = 0
+    for match in SEPARATOR_LINE.finditer(data):
+        yield start, match.start(), match.end()
+        start = match.end()
+    if start < len(data):
+        yield start, len(data), len(data)
+
+
+def _write(
+    file: Union[os.PathLike, str],
+    output: Optional[Union[os.PathLike, str]],
+    spans: Callable[[memoryview], Iterable[Tuple[int, int]]],
+) -> None:
+    """Write data[start:end] for all spans of file to output (or back to file)."""
+    target = Path(output or file)
+    temp = Path(f'{target}.part')
+    with mapped(file) as data, open(temp, 'wb', buffering=BUFFER_SIZE) as dst:
+        view = memoryview(data)
+        try:
+            for start, end in spans(view):
+                dst.write(view[start:end])
+        finally:
+            view.release()  # the mmap can't be closed while a view is alive
+    os.replace(temp, target)
+
+
+def drop_lines(
+    file: Union[os.PathLike, str],
+    prefixes: Iterable[str],
+    output: Optional[Union[os.PathLike, str]] = None,
+) -> None:
+    """Remove lines starting with any of prefixes, without decoding anything."""
+    pattern = line_pattern(prefixes)
+    _write(file, output, lambda data: _kept_lines(data, pattern))
+
+
+def filter_records(
+    file: Union[os.PathLike, str],
+    keep: Callable[[memoryview], bool],
+    output: Optional[Union[os.PathLike, str]] = None,
+) -> None:
+    """Keep records (with their separator lines) for which keep(raw record) is true.
+    keep gets a memoryview of the record's bytes.
+    """
+    def spans(data):
+        for start, end, after in record_spans(data):
+            if keep(data[start:end]):
+                yield start, after
+    _write(file, output, spans)
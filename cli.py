@@ -0,0 +1,164 @@
+import argparse
+import importlib
+import sys
+from typing import List, Optional
+
+
+# Only argparse is imported up front: every command imports what it needs
+# when it runs, so e.g. 'tidy' never loads selenium, asyncio or tqdm.
+
+# Commands with their own parsers: (module, function called with the rest of argv)
+DELEGATED = {
+    'run': ('pipeline', 'main', 'convert, tidy, select and remove fields in one pass'),
+    'bench': ('benchmark', 'main', 'time the hot paths on generated corpora'),
+}
+
+
+def _tags(text: str) -> List[str]:
+    """'001,#005:' -> ['#001:', '#005:']"""
+    return [f"#{tag.strip().strip('#:')}:" for tag in text.split(',') if tag.strip()]
+
+
+# ===== Commands =====
+def tidy(args: argparse.Namespace) -> None:
+    from .tidy import NothingToTidy, tidy_file
+    try:
+        tidy_file(args.file, newfile=args.new, workers=args.workers, cache=args.cache)
+    except NothingToTidy:
+        print('Nothing to tidy')
+
+
+def convert(args: argparse.Namespace) -> None:
+    from .get_text import into, outof
+    from .marc_to_irbis import convert, iter_convert
+    if args.stream:
+        into(args.output, 'from iter', (record for record in iter_convert(args.file) if record))
+    else:
+        into(args.output, 'from string', convert(outof(args.file, 'to string')))
+
+
+def select(args: argparse.Namespace) -> None:
+    from .select_records import load_terms, select_file
+    select_file(args.file, args.mode, load_terms(args.terms), args.output)
+
+
+def remove_fields(args: argparse.Namespace) -> None:
+    from .remove_fields import remove_fields
+    for file in args.files:
+        remove_fields(file, _tags(args.tags))
+
+
+def sort(args: argparse.Namespace) -> None:
+    from .sorting import sort_many
+    sort_many(args.files, _tags(args.exclude) if args.exclude else ())
+
+
+def join(args: argparse.Namespace) -> None:
+    from .files_together import files_together
+    files_together(args.folder)
+
+
+def split(args: argparse.Namespace) -> None:
+    from .shards import split_records, split_shards
+    if args.shards:
+        print(f'Manifest: {split_shards(args.file, args.shards, args.output_dir, args.workers)}')
+    else:
+        print(f'{split_records(args.file, args.output_dir, workers=args.workers)} files')
+
+
+def check_links(args: argparse.Namespace) -> None:
+    from .link_checker import broken, check_links
+    from .url_extract import extract
+    found = extract(args.file, by=args.by)
+    print(f'{len(found)} unique links out of {found.found} found.')
+    results = check_links(found, concurrency=args.concurrency, timeout=args.timeout)
+    for result in broken(results):
+        where = ', '.join(str(n + 1) for n in found.records(result.url))
+        print(f"Broken: {result.url} ({result.error or f'Status: {result.status}'}) "
+              f"in {args.by} {where}")
+
+
+# ===== Parser =====
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='irma', description='Tools for IRBIS/RUSMarc exports.')
+    commands = parser.add_subparsers(dest='command', metavar='command', required=True)
+    # Shared by the commands that can be measured (see metrics)
+    measured = argparse.ArgumentParser(add_help=False)
+    measured.add_argument('--metrics', nargs='?', const='', metavar='JSON',
+                          help='print time and sizes per stage and save them to JSON if a file is given')
+
+    for name, (_, _, summary) in DELEGATED.items():
+        commands.add_parser(name, help=summary, add_help=False)
+
+    command = commands.add_parser('tidy', parents=[measured], help='clean an IRBIS text file')
+    command.add_argument('file')
+    command.add_argument('--new', action='store_true', help='save to <file>_cleaned.txt')
+    command.add_argument('--workers', type=int, default=1, help='processes (0 for all cores)')
+    command.add_argument('--cache', help='TidyCache file to reuse results from')
+    command.set_defaults(handler=tidy)
+
+    command = commands.add_parser('convert', parents=[measured], help='MARCXML to IRBIS text')
+    command.add_argument('file')
+    command.add_argument('-o', '--output', required=True)
+    command.add_argument('--stream', action='store_true',
+                         help='streaming parser instead of the regexes (bounded memory; &quot;, &apos;, '
+                              '&#NNN; and a literal > come out differently)')
+    command.set_defaults(handler=convert)
+
+    command = commands.add_parser('select', parents=[measured],
+                                  help='keep records with or without terms')
+    command.add_argument('file')
+    command.add_argument('mode', choices=('with', 'without'))
+    command.add_argument('terms', help='.txt (one per line) or .json file of terms')
+    command.add_argument('-o', '--output', help='file to write (default: change file)')
+    command.set_defaults(handler=select)
+
+    command = commands.add_parser('remove-fields', help='drop fields by tag')
+    command.add_argument('tags', help='comma-separated tags, e.g. 001,005')
+    command.add_argument('files', nargs='+')
+    command.set_defaults(handler=remove_fields)
+
+    command = commands.add_parser('sort', help='sort fields and records (for comparing)')
+    command.add_argument('files', nargs='+')
+    command.add_argument('--exclude', help='comma-separated tags to leave out, e.g. 907,910')
+    command.set_defaults(handler=sort)
+
+    command = commands.add_parser('join', help='join the .txt files of a folder')
+    command.add_argument('folder')
+    command.set_defaults(handler=join)
+
+    command = commands.add_parser('split', help='one file per record, or N shards')
+    command.add_argument('file')
+    command.add_argument('--shards', type=int, help='number of size-balanced shards')
+    command.add_argument('-o', '--output-dir', help='default: folder named like the file')
+    command.add_argument('--workers', type=int, default=4)
+    command.set_defaults(handler=split)
+
+    command = commands.add_parser('check-links', help='find broken links in a text file')
+    command.add_argument('file')
+    command.add_argument('--by', choices=('lines', 'records'), default='lines')
+    command.add_argument('--concurrency', type=int, default=50)
+    command.add_argument('--timeout', type=float, default=10)
+    command.set_defaults(handler=check_links)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point, also fit for a console_scripts 'irma = irma.cli:main'."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in DELEGATED:
+        module, function, _ = DELEGATED[argv[0]]
+        getattr(importlib.import_module(f'.{module}', __package__), function)(argv[1:])
+        return
+
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'metrics', None) is None:
+        args.handler(args)
+        return
+    from . import metrics
+    with metrics.collect() as stats:
+        args.handler(args)
+    print(stats.report())
+    if args.metrics:
+        stats.save(args.metrics)
+
@@ -0,0 +1,168 @@
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .get_text import RECORD_SEPARATOR
+
+
+# Probability of a field being in a record
+FIELD_MIX: Dict[str, float] = {
+    '010': 0.9,   # ISBN
+    '101': 1.0,   # language
+    '200': 1.0,   # title
+    '210': 0.95,  # publication
+    '215': 0.9,   # pages
+    '330': 0.6,   # summary
+    '606': 0.7,   # subject
+    '700': 0.85,  # author
+    '701': 0.4,   # other authors
+    '856': 0.5,   # link
+    '903': 1.0,   # id
+}
+DUPLICATION_RATE = 0.05  # share of records that repeat an earlier one with a new id
+# Bump when the records generated for the same arguments change
+VERSION = 2
+
+WORDS = (
+    'история', 'россии', 'экономика', 'предприятия', 'основы', 'теория', 'практика',
+    'управление', 'право', 'информационные', 'технологии', 'анализ', 'методы',
+    'система', 'развитие', 'социальная', 'психология', 'педагогика', 'учебник',
+    'пособие', 'математика', 'физика', 'химия', 'литература', 'язык', 'культура',
+    'государство', 'общество', 'финансы', 'маркетинг', 'логистика', 'медицина',
+)
+SURNAMES = ('Иванов', 'Петрова', 'Сидоров', 'Кузнецова', 'Смирнов', 'Попова', 'Волков', 'Соколова')
+CITIES = ('Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург')
+PUBLISHERS = ('Лань', 'Юрайт', 'Инфра-М', 'Проспект', 'КноРус', 'Наука', 'Питер & К')
+
+Field = Tuple[str, List[Tuple[str, str]]]  # tag, [(code, value)]; code '' is text before subfields
+
+
+def _words(rng: random.Random, low: int, high: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _initials(rng: random.Random) -> str:
+    return f'{rng.choice("АБВГДЕИКЛМНОПС")}.{rng.choice("АБВГДЕИКЛМНОПС")}.'
+
+
+def _field(rng: random.Random, tag: str, number: int) -> Field:
+    """One field with the kinds of mess tidy is there for:
+    lowercase subfield codes, double spaces, quoted publishers, 'с.' after pages.
+    Quotes and ampersands are written as entities (see _entities).
+    """
+    if tag == '010':
+        return tag, [('A', f'978-5-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}-{rng.randint(0, 9)}')]
+    if tag == '101':
+        return tag, [('', rng.choice(('rus', 'rus', 'rus', 'eng')))]
+    if tag == '200':
+        title = _words(rng, 2, 7).capitalize()
+        if rng.random() < 0.1:
+            title = title.upper()
+        subfields = [('A', title), ('E', _words(rng, 1, 4))]
+        if rng.random() < 0.3:
+            subfields.append(('F', f'{_initials(rng)} {rng.choice(SURNAMES)}'))
+        return tag, subfields
+    if tag == '210':
+        publisher = rng.choice(PUBLISHERS)
+        if rng.random() < 0.3:
+            publisher = f'Издательство "{publisher}"'
+        elif rng.random() < 0.2:
+            publisher = f'ООО "{publisher}"'
+        return tag, [('A', rng.choice(CITIES)), ('C', publisher), ('D', str(rng.randint(1990, 2025)))]
+    if tag == '215':
+        pages = str(rng.randint(40, 900))
+        return tag, [('A', f'{pages} с.' if rng.random() < 0.5 else pages)]
+    if tag == '330':
+        text = '. '.join(_words(rng, 5, 15).capitalize() for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.2:
+            text = text.replace(' ', '  ', 1)
+        if rng.random() < 0.1:
+            text += f'. Для групп > {rng.randint(2, 30)} человек'
+        return tag, [('A', text + '.')]
+    if tag == '606':
+        # Some codes come in lowercase, tidy capitalizes them
+        return tag, [('a' if rng.random() < 0.2 else 'A', _words(rng, 1, 3).capitalize())]
+    if tag in ('700', '701'):
+        return tag, [('A', rng.choice(SURNAMES)), ('B', _initials(rng))]
+    if tag == '856':
+        return tag, [('U', f'https://ibooks.ru/bookshelf/{rng.randint(1000, 999999)}')]
+    if tag == '903':
+        return tag, [('', f'ID-{number:08d}')]
+    return tag, [('A', _words(rng, 1, 3))]
+
+
+def iter_corpus(
+    count: int,
+    field_mix: Optional[Dict[str, float]] = None,
+    duplicates: float = DUPLICATION_RATE,
+    seed: int = 1,
+) -> Iterator[List[Field]]:
+    """Yield count records as lists of fields. Same arguments, same records."""
+    rng = random.Random(seed)
+    field_mix = FIELD_MIX if field_mix is None else field_mix
+    earlier: List[List[Field]] = []
+    for number in range(count):
+        if earlier and rng.random() < duplicates:
+            fields = [field for field in rng.choice(earlier) if field[0] != '903']
+            fields.append(_field(rng, '903', number))
+        else:
+            fields = [
+                _field(rng, tag, number)
+                for tag, probability in field_mix.items() if rng.random() < probability
+            ]
+            # A bounded sample of records that duplicates are taken from
+            if len(earlier) < 1000:
+                earlier.append(fields)
+            else:
+                earlier[rng.randrange(1000)] = fields
+        yield fields
+
+
+def _entities(text: str) -> str:
+    """Text as our MARCXML exports have it, and so as converted IRBIS text has it:
+    &, < and " are entities, > is left as it is.
+    """
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;')
+
+
+def irbis_text(fields: List[Field]) -> str:
+    """IRBIS text of a record (no separator)."""
+    lines = []
+    for tag, subfields in fields:
+        value = ''.join(
+            f'^{code}{_entities(text)}' if code else _entities(text) for code, text in subfields
+        )
+        lines.append(f'#{int(tag)}: {value}')
+    return '\n'.join(lines)
+
+
+def marcxml_text(fields: List[Field]) -> str:
+    """RUSMarc XML of a record, as in exports converted by marc_to_irbis."""
+    parts = ['<record syntax="RUSMarc"><leader><length>00000</length></leader>']
+    for tag, subfields in fields:
+        parts.append(f'<field id="{tag}">')
+        for code, text in subfields:
+            if code:
+                parts.append(f'<subfield id="{code}">{_entities(text)}</subfield>')
+            else:
+                parts.append(_entities(text))
+        parts.append('</field>')
+    parts.append('</record>')
+    return ''.join(parts)
+
+
+def write_irbis(path, count: int, **options) -> None:
+    """IRBIS text file of count records; options go to iter_corpus."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for fields in iter_corpus(count, **options):
+            f.write(irbis_text(fields))
+            f.write(f'\n{RECORD_SEPARATOR}\n')
+
+
+def write_marcxml(path, count: int, **options) -> None:
+    """MARCXML file of count records; options go to iter_corpus."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<records>\n')
+        for fields in iter_corpus(count, **options):
+            f.write(marcxml_text(fields))
+            f.write('\n')
+        f.write('</records>\n')
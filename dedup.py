@@ -0,0 +1,133 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple
+
+import numpy as np
+from tqdm import tqdm
+
+from .record import Record
+
+
+KEY_FIELDS = ('200', '700', '210')
+MASK32 = np.uint64(0xFFFFFFFF)
+
+
+class Duplicate(NamedTuple):
+    index: int  # position of the record in the input
+    similarity: float  # estimated Jaccard similarity to the group's first record
+
+
+def key_text(record: str, fields: Iterable[str] = KEY_FIELDS) -> str:
+    """Normalized text of the key fields: no case, subfield marks, punctuation."""
+    parsed = Record(record)
+    text = ' '.join(value for tag in fields for value in parsed.fields(tag))
+    text = re.sub(r'\^.', ' ', text).casefold()
+    return ' '.join(re.sub(r'[^\w]+', ' ', text).split())
+
+
+class Deduplicator:
+    """Near-duplicate finder: character shingles of key fields,
+    MinHash signatures and LSH banding, all vectorized with NumPy.
+
+    num_perm = bands * rows; records whose signatures agree on all rows
+    of any band become candidates and are kept if their estimated
+    similarity is at least threshold.
+    """
+
+    def __init__(
+        self,
+        fields: Iterable[str] = KEY_FIELDS,
+        shingle: int = 4,
+        bands: int = 16,
+        rows: int = 8,
+        threshold: float = 0.8,
+        seed: int = 1,
+    ) -> None:
+        self.fields = tuple(fields)
+        self.shingle = shingle
+        self.bands = bands
+        self.rows = rows
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows
+        # Multiply-shift hashing: ((a * x + b) mod 2**64) >> 32
+        self.a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self.powers = np.array(
+            [pow(1_000_003, shingle - 1 - i, 2**32) for i in range(shingle)], dtype=np.uint64
+        )
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Unique 32-bit hashes of all character k-grams of text."""
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        k = self.shingle
+        if len(codes) < k:
+            return np.unique(codes) if len(codes) else codes
+        windows = np.lib.stride_tricks.sliding_window_view(codes, k)
+        return np.unique((windows * self.powers).sum(axis=1) & MASK32)
+
+    def signature(self, record: str) -> np.ndarray:
+        """MinHash signature (num_perm uint32) of a record's key fields.
+        Records with empty key fields get an all-max signature and are never matched.
+        """
+        shingles = self.shingles(key_text(record, self.fields))
+        if not len(shingles):
+            return np.full(len(self.a), 0xFFFFFFFF, dtype=np.uint32)
+        hashed = (self.a[:, None] * shingles[None, :] + self.b[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def signatures(self, records: Iterable[str]) -> np.ndarray:
+        return np.stack([self.signature(record) for record in tqdm(records, desc='MinHash')])
+
+    def groups(self, signatures: np.ndarray) -> List[List[Duplicate]]:
+        """Groups of likely duplicates (2+ records each), first record first."""
+        empty = (signatures == 0xFFFFFFFF).all(axis=1)
+        parent = list(range(len(signatures)))
+
+        def root(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for band in range(self.bands):
+            rows = signatures[:, band * self.rows:(band + 1) * self.rows]
+            buckets: Dict[bytes, int] = {}
+            for i in np.flatnonzero(~empty):
+                first = buckets.setdefault(rows[i].tobytes(), i)
+                if first != i and root(first) != root(i):
+                    # Compare with the bucket's first record only: linear per bucket
+                    if (signatures[first] == signatures[i]).mean() >= self.threshold:
+                        parent[root(i)] = root(first)
+
+        clusters: Dict[int, List[int]] = {}
+        for i in range(len(signatures)):
+            clusters.setdefault(root(i), []).append(i)
+        result = []
+        for members in clusters.values():
+            if len(members) < 2:
+                continue
+            head = signatures[members[0]]
+            result.append([
+                Duplicate(i, float((signatures[i] == head).mean())) for i in members
+            ])
+        return result
+
+    def find(self, records: List[str]) -> List[List[Duplicate]]:
+        return self.groups(self.signatures(records))
+
+
+def find_duplicates(records: List[str], **options) -> List[List[Duplicate]]:
+    """Groups of likely duplicate records, options go to Deduplicator."""
+    return Deduplicator(**options).find(records)
+
+
+def drop_duplicates(records: List[str], **options) -> List[str]:
+    """Keep only the first record of every group of likely duplicates."""
+    doomed = {
+        duplicate.index
+        for group in find_duplicates(records, **options)
+        for duplicate in group[1:]
+    }
+    new_records = [record for i, record in enumerate(records) if i not in doomed]
+    print(f'Removed {len(doomed)} duplicates. Remaining: {len(new_records)}')
+    return new_records
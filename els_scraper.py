@@ -1,20 +1,17 @@
-import requests
 import webbrowser
-from bs4 import BeautifulSoup
 from collections import namedtuple
 from os import PathLike
-from pathlib import Path
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-# from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 # from typing import Literal
 from urllib.error import HTTPError, URLError
 from urllib.request import urlopen, Request
 
 from irma import get_text
-from irma import tqdm
+from irma import page_markers
+from irma.link_cache import LinkCache
+from irma.link_checker import LinkResult, check_links
+from irma.render_pool import FirefoxRenderer, RenderPool
 from irma.python_url_regex import NET_ADDR_PATTERN as URL_PATTERN
+from irma.url_extract import extract
 
 
 def check(url: str) -> None:
@@ -28,103 +25,88 @@ def check(url: str) -> None:
         print(f"Broken: {url} ({str(e)})")
 
 
+def check_many(urls: list, **options) -> list[LinkResult]:
+    """Check many URLs concurrently (see link_checker.LinkChecker for options)."""
+    return check_links(urls, **options)
+
+
 def open_in_browser(url: str) -> None:
     webbrowser.open(url, new=2, autoraise=True)
 
 
 def extract_from(file: PathLike | str) -> list:
-    """Extract web links from text file."""
-    # Read file content
-    try:
-        text = Path(file).read_text(encoding='utf-8', errors='ignore')
-    except FileNotFoundError:
-        text = file
-
-    # Find URLs with regex
-    found_urls = URL_PATTERN.findall(text)
+    """Extract unique web links from text file (or text), record by record.
+    Use url_extract.extract directly to know which records they came from.
+    """
+    found_urls = extract(file, pattern=URL_PATTERN)
     if not found_urls:
         print("No URLs found in file.")
         return
-    return found_urls
-
+    return found_urls.urls
 
-def selenium_scrape(urls, results=[]):
-    """Properly maintained driver instance for multiple URLs"""
-    # Initialize driver with persistent settings
-    options = webdriver.FirefoxOptions()
-    options.set_preference("dom.webdriver.enabled", False)
-    options.add_argument("-headless")
-    
-    # Start driver (will persist for all URLs)
-    driver = webdriver.Firefox(options=options)
-    driver.implicitly_wait(10)  # Global timeout
-    
-    try:
-        for url in tqdm(urls):
-            try:
-                driver.get(url)  # Always start fresh
-                
-                # Reset execution context
-                WebDriverWait(driver, 15).until(
-                    lambda d: d.execute_script("return document.readyState") == "complete"
-                )
-                
-                # Multiple ways to detect the "Read" button
-                read_button_selectors = [
-                    ("CSS", "ebs-book-read-button button.button-read"),  # Component structure
-                    ("XPATH", "//button[contains(@class,'button-read') and contains(.,'Читать')]"),
-                    ("CSS", "button.mat-raised-button:has(span:contains('Читать'))"),  # Material button
-                    ("XPATH", "//ebs-book-read-button//button[span[contains(text(),'Читать')]]")
-                ]
-                
-                result = {
-                    "url": url,
-                    "has_read_link": False,
-                }
-                
-                # Check for read button
-                for by, selector in read_button_selectors:
-                    try:
-                        btn = driver.find_element(
-                            (By.CSS_SELECTOR if by == "CSS" else By.XPATH), selector)
-                        if btn.is_displayed():
-                            result["has_read_link"] = True
-                            break
-                    except:
-                        continue
-                
-            except Exception as e:
-                driver.save_screenshot(f"error_{url.split('/')[-1]}.png")
-                print(f"Error checking {url}: {str(e)}")
-                result["has_read_link"] = None
-            
-            finally:
-                results.append(result)
-        
-    finally:
-        # Ensure driver quits even if errors occur
-        driver.quit()
-        return results
 
+def selenium_scrape(urls, results=None, workers=4, factory=FirefoxRenderer):
+    """Render JS pages in a pool of reusable headless browsers.
+    factory makes one renderer (see render_pool.Renderer), e.g. a fake one for tests.
+    """
+    if results is None:
+        results = []
+    pool = RenderPool(factory, workers=workers)
+    results.extend(pool.check(urls))
+    return results
 
-def check_page(session, url):
-    """Check a single page for the required elements"""
-    response = session.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    if 'znanium' in url:
-        # Check for "Читать книгу" link
-        read_link = soup.find('a', string='Читать книгу') or \
-                    soup.find('span', {'class': 'hover_title'}, string='Читать книгу')
-  
-    elif 'ibooks' in url:
-        read_link = soup.find('a', {'class': 'btn btn--small'})
 
-    return read_link is not None
+PAGE_CHUNK = 16 * 1024
 
 
-def scrape(urls):
-    """Main scraping function"""
+def check_page(session, url):
+    """Check a single page for the required elements.
+    The page is read in chunks and the connection is closed
+    as soon as the site's marker is found or ruled out.
+    """
+    rule = page_markers.rule_for(url)
+    with session.get(url, stream=True) as response:
+        return page_markers.scan(
+            response.iter_content(PAGE_CHUNK), rule, response.encoding)
+
+
+def has_read_link(url, html):
+    """Look for the required elements in a whole page"""
+    return page_markers.scan([html.encode('utf-8')], page_markers.rule_for(url))
+
+
+def check_page_cached(session, url, cache):
+    """check_page that asks the server only for pages changed since the last check.
+    Error statuses (403, 429, 5xx...) raise and are not cached,
+    so the page is checked again next time instead of being taken as unavailable.
+    """
+    entry = cache.get(url)
+    if cache.is_fresh(entry) and entry.has_read_link is not None:
+        return entry.has_read_link
+
+    rule = page_markers.rule_for(url)
+    with session.get(url, headers=cache.validators(entry), stream=True) as response:
+        if response.status_code == 304 and entry is not None:
+            cache.touch(url)
+            return entry.has_read_link
+        response.raise_for_status()
+        result = page_markers.scan(
+            response.iter_content(PAGE_CHUNK), rule, response.encoding)
+    cache.put(
+        url, response.status_code, result,
+        response.headers.get('ETag'), response.headers.get('Last-Modified')
+    )
+    return result
+
+
+def scrape(urls, cache=None):
+    """Main scraping function.
+    cache: LinkCache (or path to one) to skip pages checked recently
+    and revalidate the rest with conditional requests.
+    """
+    if cache is not None and not isinstance(cache, LinkCache):
+        cache = LinkCache(cache)
+    import requests  # only scraping needs it, not the link checks
     session = requests.Session()
         # Set headers to mimic a browser
     session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64;'
@@ -136,8 +118,15 @@ def scrape(urls):
     for url in urls:
         try:
             if 'lanbook' in url:
-                lanbook_urls.append(url)
+                entry = cache.get(url) if cache else None
+                if cache and cache.is_fresh(entry) and entry.has_read_link is not None:
+                    results.append({'url': url, 'has_read_link': entry.has_read_link})
+                else:
+                    lanbook_urls.append(url)
                 continue
+            elif cache:
+                result = check_page_cached(session, url, cache)
+                results.append({'url': url, 'has_read_link': result})
             else:
                 result = check_page(session, url)
                 results.append({'url': url, 'has_read_link': result})
@@ -148,7 +137,12 @@ def scrape(urls):
 
     if lanbook_urls:
         print("Launching browser to render JavaScript from e.lanbook.com...")
-        selenium_scrape(lanbook_urls, results)
+        rendered = selenium_scrape(lanbook_urls, [])
+        results.extend(rendered)
+        if cache:
+            for res in rendered:
+                if res['has_read_link'] is not None:
+                    cache.put(res['url'], None, res['has_read_link'])
 
     # Handling results
     unavailables = [res['url'] for res in results if not res['has_read_link']]
@@ -0,0 +1,73 @@
+import heapq
+import pickle
+import tempfile
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List
+
+
+MEMORY_BUDGET = 64 << 20  # characters of records held in memory before a run is spilled
+BATCH = 1024  # records pickled together in a run file
+
+
+def normalize_record(record: str, exclude: Iterable[str] = (), sep: str = '\n') -> str:
+    """Sort lines of a record, dropping lines of excluded fields (e.g. '#907:')."""
+    exclude = tuple(exclude)
+    lines = [line for line in record.splitlines() if not line.startswith(exclude)]
+    return sep.join(sorted(lines))
+
+
+def _spill(run: List[str], directory: Path, number: int) -> Path:
+    """Write a sorted run to a temp file in batches."""
+    path = directory / f'run{number:05d}'
+    run.sort()
+    with open(path, 'wb') as f:
+        for start in range(0, len(run), BATCH):
+            pickle.dump(run[start:start + BATCH], f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(f: IO[bytes]) -> Iterator[str]:
+    while True:
+        try:
+            yield from pickle.load(f)
+        except EOFError:
+            return
+
+
+def sort_records(
+    records: Iterable[str],
+    exclude: Iterable[str] = (),
+    sep: str = '\n',
+    budget: int = MEMORY_BUDGET,
+) -> Iterator[str]:
+    """Yield non-empty records with sorted lines, in sorted order.
+    Sorted runs go to temp files whenever budget is exceeded
+    and are merged back k-way, so the input may be bigger than memory.
+    """
+    exclude = tuple(exclude)
+    run: List[str] = []
+    size = 0
+    with tempfile.TemporaryDirectory(prefix='irma_sort_') as directory:
+        directory = Path(directory)
+        runs: List[Path] = []
+        for record in records:
+            record = normalize_record(record, exclude, sep)
+            if not record:
+                continue  # e.g. the empty one after the last separator
+            run.append(record)
+            size += len(record)
+            if size > budget:
+                runs.append(_spill(run, directory, len(runs)))
+                run, size = [], 0
+
+        run.sort()
+        if not runs:
+            yield from run
+            return
+
+        files = [open(path, 'rb') for path in runs]
+        try:
+            yield from heapq.merge(run, *(_read_run(f) for f in files))
+        finally:
+            for f in files:
+                f.close()
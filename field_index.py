@@ -0,0 +1,156 @@
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, List, Literal, Optional, Union
+
+from .get_text import iter_raw_records
+from .record import Record, normalize_tag, parse_subfields
+
+
+INDEX_VERSION = 2
+INDEX_SUFFIX = '.idx.sqlite'
+
+SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE records (offset INTEGER PRIMARY KEY, length INTEGER);
+CREATE TABLE postings (tag TEXT, code TEXT, value TEXT, offset INTEGER);
+'''
+POSTINGS_INDEX = 'CREATE INDEX postings_key ON postings (tag, code, value)'
+
+
+def normalize(value: str) -> str:
+    """Make values comparable: case, hyphens (ISBN), spacing, trailing punctuation."""
+    value = re.sub(r'\s+', ' ', value.replace('-', '')).strip(' .,;:/')
+    return value.casefold()
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode('utf-8', errors='ignore').strip('\n\r*')
+
+
+class FieldIndex:
+    """Sidecar SQLite index of an IRBIS export:
+    (tag, subfield, normalized value) -> byte offsets of records.
+
+    Built once per file and rebuilt automatically when the file's
+    size or mtime changes. Lookups only read the matching records.
+    """
+
+    def __init__(
+        self,
+        file: Union[os.PathLike, str],
+        index_file: Optional[Union[os.PathLike, str]] = None
+    ) -> None:
+        self.file = Path(file)
+        self.index_file = Path(index_file or f'{file}{INDEX_SUFFIX}')
+        self.db = sqlite3.connect(self.index_file)
+        if not self.is_fresh():
+            self.build()
+
+    # ===== Building =====
+    def _signature(self) -> dict:
+        stat = self.file.stat()
+        return {
+            'size': str(stat.st_size),
+            'mtime': str(stat.st_mtime_ns),
+            'version': str(INDEX_VERSION),
+        }
+
+    def is_fresh(self) -> bool:
+        """Check that the index was built from the file as it is now."""
+        try:
+            stored = dict(self.db.execute('SELECT key, value FROM meta'))
+        except sqlite3.DatabaseError:
+            return False
+        return stored == self._signature()
+
+    def build(self) -> None:
+        """(Re)build the whole index in one pass over the file."""
+        print(f'Indexing {self.file}...')
+        signature = self._signature()
+        with self.db:
+            for table in ('meta', 'records', 'postings'):
+                self.db.execute(f'DROP TABLE IF EXISTS {table}')
+            self.db.executescript(SCHEMA)
+            with open(self.file, 'rb') as f:
+                for offset, raw in iter_raw_records(f):
+                    self.db.execute(
+                        'INSERT INTO records VALUES (?, ?)', (offset, len(raw))
+                    )
+                    self.db.executemany(
+                        'INSERT INTO postings VALUES (?, ?, ?, ?)',
+                        self._postings(offset, _decode(raw))
+                    )
+            # Indexing after the bulk insert is much faster than during it
+            self.db.execute(POSTINGS_INDEX)
+            self.db.executemany(
+                'INSERT INTO meta VALUES (?, ?)', signature.items()
+            )
+
+    @staticmethod
+    def _postings(offset: int, text: str) -> Iterator[tuple]:
+        seen = set()
+        for tag, value in Record(text):
+            for code, values in parse_subfields(value).items():
+                for subvalue in values:
+                    key = (tag, code, normalize(subvalue))
+                    if key[2] and key not in seen:
+                        seen.add(key)
+                        yield (*key, offset)
+
+    # ===== Lookup =====
+    def offsets(self, tag: str, code: str, values: Iterable[str]) -> List[int]:
+        """Sorted offsets of records where ^code of #tag equals any of values
+        ('010' and '10' are the same tag).
+        """
+        found = set()
+        for value in {normalize(value) for value in values}:
+            found.update(offset for (offset,) in self.db.execute(
+                'SELECT offset FROM postings WHERE tag = ? AND code = ? AND value = ?',
+                (normalize_tag(tag), code.upper(), value)
+            ))
+        return sorted(found)
+
+    def _read(self, f, offset: int) -> str:
+        (length,) = self.db.execute(
+            'SELECT length FROM records WHERE offset = ?', (offset,)
+        ).fetchone()
+        f.seek(offset)
+        return _decode(f.read(length))
+
+    def records(self, tag: str, code: str, values: Iterable[str]) -> Iterator[str]:
+        """Fetch matching records by seeking in the export."""
+        with open(self.file, 'rb') as f:
+            for offset in self.offsets(tag, code, values):
+                yield self._read(f, offset)
+
+    def select(
+        self,
+        mode: Literal['with', 'without'],
+        tag: str,
+        code: str,
+        values: Iterable[str]
+    ) -> Iterator[str]:
+        """Indexed counterpart of select_records for one field/subfield."""
+        assert mode in {"with", "without"}, f"Invalid mode: {mode}. Use 'with' or 'without'"
+        if mode == 'with':
+            yield from self.records(tag, code, values)
+            return
+        excluded = set(self.offsets(tag, code, values))
+        with open(self.file, 'rb') as f:
+            for offset, length in self.db.execute(
+                'SELECT offset, length FROM records ORDER BY offset'
+            ):
+                if offset not in excluded:
+                    f.seek(offset)
+                    yield _decode(f.read(length))
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> 'FieldIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,22 +1,86 @@
+import os
+import shutil
 import sys
 from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
 
 from tqdm import tqdm
 
 from . import get_text
+from .get_text import RECORD_SEPARATOR
 
-def files_together(folder_name):
+BUFFER_SIZE = 1 << 20
+SEPARATOR_LINE = f'\n{RECORD_SEPARATOR}\n'.encode()
+
+
+def _ends_with_separator(src) -> bool:
+    """Look at the end of an open binary file only."""
+    size = os.fstat(src.fileno()).st_size
+    src.seek(max(0, size - 64))
+    return src.read().rstrip().endswith(RECORD_SEPARATOR.encode())
+
+
+def _copy(src, dst) -> None:
+    """Whole file into dst: sendfile where the OS has it, copyfileobj otherwise."""
+    src.seek(0)
+    if hasattr(os, 'sendfile'):
+        dst.flush()
+        offset, size = 0, os.fstat(src.fileno()).st_size
+        try:
+            while offset < size:
+                sent = os.sendfile(dst.fileno(), src.fileno(), offset, size - offset)
+                if not sent:
+                    break
+                offset += sent
+            return
+        except OSError:
+            src.seek(offset)
+    shutil.copyfileobj(src, dst, BUFFER_SIZE)
+
+
+def concatenate(
+    files: Iterable[Union[os.PathLike, str]],
+    output: Union[os.PathLike, str],
+    record_filter: Optional[Callable[[str], Optional[str]]] = None,
+    sep: Optional[bytes] = None,
+    mode: str = 'wb',
+) -> None:
+    """Stream many files into one output handle.
+    Without record_filter files are copied as bytes, each followed by sep
+    or, if sep is None, by a record separator unless it already ends with one.
+    record_filter gets every record of every file and returns it
+    (changed or not) or None to leave it out; sep, if given, still follows each file.
+    """
+    with open(output, mode, buffering=BUFFER_SIZE) as dst:
+        for file in tqdm(files, desc="Собираем файлы воедино"):
+            if record_filter is not None:
+                for record in get_text.outof(file, 'iter records'):
+                    kept = record_filter(record) if record else None
+                    if kept:
+                        dst.write(kept.encode('utf-8'))
+                        dst.write(SEPARATOR_LINE)
+                if sep is not None:
+                    dst.write(sep)
+                continue
+            with open(file, 'rb') as src:
+                _copy(src, dst)
+                if sep is not None:
+                    dst.write(sep)
+                elif not _ends_with_separator(src):
+                    dst.write(SEPARATOR_LINE)
+                else:
+                    dst.write(b'\n')
+
+
+def files_together(folder_name, record_filter=None):
     folder = Path(folder_name)
     assert folder.is_dir(), 'нет такой папки'
     
-    txt_files = [f for f in folder.iterdir() if f.suffix == '.txt']
+    txt_files = sorted(f for f in folder.iterdir() if f.suffix == '.txt')
     assert txt_files, 'Папка должна содержать файлы .txt'
     
-    records = list(
-        get_text.outof(file, 'to string')
-        for file in tqdm(txt_files, desc="Собираем файлы воедино")
-    )
-    get_text.into(f'{folder_name}.txt', 'from_records', records)
+    concatenate(txt_files, f'{folder_name}.txt', record_filter)
+    print(f"Saved to {folder_name}.txt")
 
 if __name__ == "__main__":
     if len(sys.argv) > 0:
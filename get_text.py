@@ -1,7 +1,13 @@
+import io
 import os
-from typing import Literal, Iterable, Union
+import time
+from typing import Literal, Iterable, Iterator, List, Union
 
-from . import marc_to_irbis
+from . import metrics
+
+
+RECORD_SEPARATOR = '*****'
+CHUNK_SIZE = 1 << 20  # characters read per step in streaming modes
 
 
 def is_irbis(text: Union[str, bytes]) -> bool:
@@ -9,22 +15,147 @@ def is_irbis(text: Union[str, bytes]) -> bool:
     return all(marker in str(text) for marker in ('#', ':', '^', '*'))
 
 
+def iter_records(
+    f: io.TextIOBase,
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    """
+    Yield records from an open text stream one at a time.
+    Reads fixed-size chunks, so memory stays flat however big the file is.
+    Yields exactly what 'to records' would put in its list.
+    """
+    # The unsplit rest, kept in pieces and joined only once a separator
+    # turns up, so a record longer than a chunk isn't copied over and over
+    parts: List[str] = []
+    size = 0
+    # Its last characters: the only place a separator straddling chunks can start
+    edge = ''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        found = (edge + chunk).find(RECORD_SEPARATOR)
+        if found == -1:
+            parts.append(chunk)
+            size += len(chunk)
+            edge = (edge + chunk)[1 - len(RECORD_SEPARATOR):]
+            continue
+        buffer = ''.join(parts) + chunk
+        start = 0
+        end = size - len(edge) + found
+        while end != -1:
+            yield buffer[start:end].strip('\n\r*')
+            start = end + len(RECORD_SEPARATOR)
+            end = buffer.find(RECORD_SEPARATOR, start)
+        rest = buffer[start:]
+        parts, size, edge = [rest], len(rest), rest[1 - len(RECORD_SEPARATOR):]
+    yield ''.join(parts).strip('\n\r*')
+
+
+def iter_raw_records(
+    f: io.BufferedIOBase,
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple]:
+    """
+    Yield (byte offset, raw bytes) of every record in a binary stream,
+    separators excluded and nothing decoded or stripped.
+    The offsets can be used to seek back to a record later.
+    """
+    separator = RECORD_SEPARATOR.encode()
+    tail = b''
+    tail_offset = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        buffer = tail + chunk
+        start = 0
+        while (end := buffer.find(separator, start)) != -1:
+            yield tail_offset + start, buffer[start:end]
+            start = end + len(separator)
+        tail_offset += start
+        tail = buffer[start:]
+    yield tail_offset, tail
+
+
+def iter_record_chunks(
+    f: io.TextIOBase,
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    """
+    Yield pieces of the text, each about chunk_size long and ending
+    right after a record separator, so no record is cut in two.
+    Joined together they give back the original text.
+    """
+    buffer = ''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        cut = buffer.rfind(RECORD_SEPARATOR)
+        if cut != -1:
+            cut += len(RECORD_SEPARATOR)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if buffer:
+        yield buffer
+
+
+def _stream_records(
+    file: Union[os.PathLike, str],
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    """Open the file lazily so it is closed when the generator is done."""
+    with open(file, 'r', encoding='utf-8', errors='ignore') as f:
+        yield from iter_records(f, chunk_size)
+
+
 def outof(
     file: Union[os.PathLike, str],
-    mode: Literal['to string', 'to lines', 'to records']
+    mode: Literal['to string', 'to lines', 'to records', 'iter records']
 ) -> Union[str, Iterable[str]]:
     """
     Read file content with different parsing modes.
-    Returns: str for 'to string', list[str] for 'to records', Iterable[str] for 'to lines'.
+    Returns: str for 'to string', list[str] for 'to records', Iterable[str] for 'to lines',
+    a generator of records for 'iter records' (the file is read in chunks).
     """
+    if metrics.current is not None:
+        return _outof_measured(file, mode, metrics.current)
+    return _outof(file, mode)
+
+
+def _outof_measured(file, mode, stats: metrics.Metrics):
+    in_memory = isinstance(file, str) and is_irbis(file)
+    bytes_in = metrics.size(file) if in_memory else metrics.file_size(file)
+    if mode == 'iter records':
+        return metrics.timed(stats, 'outof', _outof(file, mode), bytes_in)
+    start = time.perf_counter()
+    result = _outof(file, mode)
+    seconds = time.perf_counter() - start
+    bytes_out = (
+        metrics.size(result) if isinstance(result, str)
+        else sum(metrics.size(item) for item in result)
+    )
+    stats.add('outof', seconds, bytes_in, bytes_out)
+    return result
+
+
+def _outof(file, mode):
     # Handle wrong type of input
     if not isinstance(file, (os.PathLike, str)):
         raise ValueError(f"Expected PathLike or str, got {type(file)}")
     
     # Handle direct IRBIS string input
     if isinstance(file, str) and is_irbis(file):
+        if mode == 'iter records':
+            return iter_records(io.StringIO(file))
         return file
 
+    # Streaming mode keeps the file open until the generator is exhausted
+    if mode == 'iter records':
+        return _stream_records(file)
+
     # Define mode handlers
     MODE_HANDLERS = {
         'to string': lambda f: f.read(),
@@ -37,15 +168,53 @@ def outof(
         return MODE_HANDLERS[mode](f)
 
 
+def _into_iter(
+    file: Union[os.PathLike, str],
+    records: Iterable[str]
+) -> None:
+    """Write records one by one as they come, validating only the first one."""
+    records = iter(records)
+    first = next(records, None)
+    if not first:
+        raise ValueError("Text cannot be empty")
+    if not is_irbis(first + '\n' + RECORD_SEPARATOR):
+        raise ValueError(f"Invalid IRBIS text: {first[:80]}...")
+
+    with open(file, 'w', encoding='utf-8', errors='ignore') as f:
+        f.write(first + '\n*****\n')
+        for record in records:
+            f.write(record + '\n*****\n')
+
+
 def into(
     file: Union[os.PathLike, str],
-    mode: Literal['from string', 'from lines', 'from records'],
+    mode: Literal['from string', 'from lines', 'from records', 'from iter'],
     text: Union[str, Iterable[str]]
 ) -> None:
     """
     Write content to file with formatting.
+    'from iter' takes any iterable of records (e.g. a generator from
+    outof(..., 'iter records')) and writes it without building the whole text.
     Raises: ValueError if text is empty or invalid.
     """
+    if metrics.current is not None:
+        # Time spent producing the records belongs to the stages upstream
+        upstream = metrics.Upstream(text) if mode == 'from iter' else None
+        start = time.perf_counter()
+        _into(file, mode, text if upstream is None else upstream)
+        seconds = time.perf_counter() - start - (upstream.seconds if upstream else 0.0)
+        metrics.current.add('into', seconds, bytes_out=metrics.file_size(file))
+        return
+    _into(file, mode, text)
+
+
+def _into(file, mode, text):
+    # Streaming mode can't look at the whole text beforehand
+    if mode == 'from iter':
+        _into_iter(file, text)
+        print(f"Saved to {file}")
+        return
+
     # Validate input
     if not text:
         raise ValueError("Text cannot be empty")
@@ -68,6 +237,9 @@ def into(
 # # Read
 # records = outof("data.txt", "to records")  # Returns list[str]
 # lines = outof("data.txt", "to lines")      # Returns Iterable[str]
+# for record in outof("huge.txt", "iter records"):  # One record at a time
+#     ...
 
 # # Write
-# into("output.txt", "from records", ["rec1", "rec2"])
\ No newline at end of file
+# into("output.txt", "from records", ["rec1", "rec2"])
+# into("output.txt", "from iter", (rec for rec in outof("huge.txt", "iter records")))
\ No newline at end of file
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import time
+from typing import Dict, NamedTuple, Optional, Union
+
+from .link_checker import normalize_url
+
+
+DAY = 24 * 60 * 60
+
+
+class CachedLink(NamedTuple):
+    url: str
+    status: Optional[int]
+    has_read_link: Optional[bool]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    checked: float
+
+
+class LinkCache:
+    """SQLite cache of page checks keyed by normalized URL.
+    Fresh entries (younger than ttl seconds) are used as they are,
+    stale ones give validators for a conditional request.
+    """
+
+    def __init__(self, path: Union[os.PathLike, str], ttl: float = 7 * DAY) -> None:
+        self.ttl = ttl
+        self.db = sqlite3.connect(path)
+        with self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS links (key TEXT PRIMARY KEY, url TEXT, '
+                'status INTEGER, has_read_link INTEGER, etag TEXT, '
+                'last_modified TEXT, checked REAL)'
+            )
+
+    def get(self, url: str) -> Optional[CachedLink]:
+        row = self.db.execute(
+            'SELECT url, status, has_read_link, etag, last_modified, checked '
+            'FROM links WHERE key = ?', (normalize_url(url),)
+        ).fetchone()
+        if row is None:
+            return None
+        url, status, has_read_link, etag, last_modified, checked = row
+        return CachedLink(
+            url, status, None if has_read_link is None else bool(has_read_link),
+            etag, last_modified, checked
+        )
+
+    def is_fresh(self, entry: Optional[CachedLink]) -> bool:
+        return entry is not None and time.time() - entry.checked < self.ttl
+
+    @staticmethod
+    def validators(entry: Optional[CachedLink]) -> Dict[str, str]:
+        """Headers for a conditional request: unchanged pages answer 304."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def put(
+        self,
+        url: str,
+        status: Optional[int],
+        has_read_link: Optional[bool],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (normalize_url(url), url, status, has_read_link,
+                 etag, last_modified, time.time())
+            )
+
+    def touch(self, url: str) -> None:
+        """Page didn't change (304): start the ttl over."""
+        with self.db:
+            self.db.execute(
+                'UPDATE links SET checked = ? WHERE key = ?',
+                (time.time(), normalize_url(url))
+            )
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,275 @@
+import asyncio
+import ssl
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, quote, urlencode, urljoin, urlsplit, urlunsplit
+
+
+USER_AGENT = 'Mozilla/5.0'
+REDIRECTS = (301, 302, 303, 307, 308)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+HEAD_UNSUPPORTED = (405, 501)
+MAX_REDIRECTS = 5
+MAX_DRAIN = 1 << 20  # bodies bigger than that are dropped with the connection
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'yclid', '_openstat')
+
+
+def normalize_url(url: str) -> str:
+    """Key under which trivially different spellings of a link meet:
+    https for http, lowercase host, no default port, fragment,
+    trailing slash or tracking parameters, sorted query.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port not in (80, 443):
+        host = f'{host}:{parts.port}'
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAMS)
+    ))
+    scheme = 'https' if parts.scheme.lower() in ('http', 'https') else parts.scheme.lower()
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+class LinkResult(NamedTuple):
+    """Outcome of checking one URL."""
+    url: str
+    ok: bool
+    status: Optional[int] = None
+    final_url: Optional[str] = None
+    method: str = 'HEAD'
+    attempts: int = 1
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+
+class Response(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+Origin = Tuple[str, str, int]
+
+
+def _origin(url: str) -> Origin:
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f'Not an http(s) URL: {url}')
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    return parts.scheme, parts.hostname, port
+
+
+def _request_bytes(method: str, url: str) -> bytes:
+    parts = urlsplit(url)
+    scheme, host, port = _origin(url)
+    target = quote(parts.path or '/', safe="/%:@!$&'()*+,;=~-._")
+    if parts.query:
+        target += '?' + quote(parts.query, safe="/%:@!$&'()*+,;=?~-._")
+    host = host.encode('idna').decode('ascii')
+    if port != (443 if scheme == 'https' else 80):
+        host = f'{host}:{port}'
+    return (
+        f'{method} {target} HTTP/1.1\r\n'
+        f'Host: {host}\r\n'
+        f'User-Agent: {USER_AGENT}\r\n'
+        'Accept: */*\r\n'
+        'Connection: keep-alive\r\n\r\n'
+    ).encode('ascii')
+
+
+class ConnectionPool:
+    """Keep-alive connections per (scheme, host, port)."""
+
+    def __init__(self, per_host: int = 4) -> None:
+        self.per_host = per_host
+        self.idle: Dict[Origin, List[tuple]] = {}
+        self.limits: Dict[Origin, asyncio.Semaphore] = {}
+        self.ssl_context = ssl.create_default_context()
+
+    def limit(self, origin: Origin) -> asyncio.Semaphore:
+        """Semaphore that caps simultaneous requests to one host."""
+        if origin not in self.limits:
+            self.limits[origin] = asyncio.Semaphore(self.per_host)
+        return self.limits[origin]
+
+    async def acquire(self, origin: Origin) -> tuple:
+        """Return (reader, writer, reused)."""
+        idle = self.idle.get(origin, [])
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = origin
+        reader, writer = await asyncio.open_connection(
+            host, port,
+            ssl=self.ssl_context if scheme == 'https' else None,
+            server_hostname=host if scheme == 'https' else None,
+        )
+        return reader, writer, False
+
+    def release(self, origin: Origin, connection: tuple, reusable: bool) -> None:
+        reader, writer = connection
+        idle = self.idle.setdefault(origin, [])
+        if reusable and len(idle) < self.per_host:
+            idle.append(connection)
+        else:
+            writer.close()
+
+    def close(self) -> None:
+        for idle in self.idle.values():
+            for _, writer in idle:
+                writer.close()
+        self.idle.clear()
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> Optional[bytes]:
+    """Read the body so the connection can be reused.
+    None means it can't be (too big or no length given).
+    """
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Trailers end with an empty line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return bytes(body)
+            if len(body) + size > MAX_DRAIN:
+                return None
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+    if 'content-length' in headers:
+        length = int(headers['content-length'])
+        if length > MAX_DRAIN:
+            return None
+        return await reader.readexactly(length)
+    return None
+
+
+async def request(pool: ConnectionPool, method: str, url: str) -> Response:
+    """One HTTP/1.1 request over a pooled connection."""
+    origin = _origin(url)
+    for _ in range(2):
+        reader, writer, reused = await pool.acquire(origin)
+        reusable = False
+        try:
+            writer.write(_request_bytes(method, url))
+            await writer.drain()
+            status_line = await reader.readline()
+            if not status_line:
+                if reused:
+                    continue  # server dropped an idle connection: try a fresh one
+                raise ConnectionError('Connection closed without response')
+            version, status, *_ = status_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            status = int(status)
+            body = b''
+            if method != 'HEAD' and status not in (204, 304) and status >= 200:
+                body = await _read_body(reader, headers)
+            reusable = (
+                body is not None
+                and version == 'HTTP/1.1'
+                and headers.get('connection', '').lower() != 'close'
+            )
+            return Response(status, headers, body or b'')
+        finally:
+            pool.release(origin, (reader, writer), reusable)
+    raise ConnectionError('Connection closed without response')
+
+
+class LinkChecker:
+    """Checks many URLs concurrently: bounded in total and per host,
+    reusing connections, HEAD first with GET fallback, retrying 429/5xx.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 50,
+        per_host: int = 4,
+        timeout: float = 10,
+        retries: int = 3,
+        backoff: float = 0.5,
+    ) -> None:
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    async def _follow(self, pool: ConnectionPool, method: str, url: str) -> tuple:
+        """Request with redirects followed. Returns (response, final url)."""
+        for _ in range(MAX_REDIRECTS + 1):
+            async with pool.limit(_origin(url)):
+                response = await asyncio.wait_for(
+                    request(pool, method, url), self.timeout
+                )
+            if response.status in REDIRECTS and 'location' in response.headers:
+                url = urljoin(url, response.headers['location'])
+                continue
+            return response, url
+        raise ConnectionError(f'More than {MAX_REDIRECTS} redirects')
+
+    def _delay(self, attempt: int, response: Optional[Response]) -> float:
+        retry_after = response.headers.get('retry-after', '') if response else ''
+        if retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * 2 ** (attempt - 1)
+
+    async def check(self, pool: ConnectionPool, url: str) -> LinkResult:
+        start = time.perf_counter()
+        method = 'HEAD'
+        attempt = 0
+        while True:
+            attempt += 1
+            response = None
+            try:
+                response, final_url = await self._follow(pool, method, url)
+                if method == 'HEAD' and response.status in HEAD_UNSUPPORTED:
+                    method = 'GET'
+                    attempt -= 1  # not a failure, just the wrong method
+                    continue
+                if response.status in RETRY_STATUSES and attempt <= self.retries:
+                    await asyncio.sleep(self._delay(attempt, response))
+                    continue
+                return LinkResult(
+                    url, response.status == 200, response.status, final_url,
+                    method, attempt, elapsed=time.perf_counter() - start
+                )
+            except (OSError, asyncio.TimeoutError, ValueError, asyncio.IncompleteReadError) as e:
+                if isinstance(e, ValueError) or attempt > self.retries:
+                    return LinkResult(
+                        url, False, None, None, method, attempt,
+                        error=str(e) or type(e).__name__,
+                        elapsed=time.perf_counter() - start
+                    )
+                await asyncio.sleep(self._delay(attempt, None))
+
+    async def check_all(self, urls: Iterable[str]) -> List[LinkResult]:
+        """Results come in the same order as urls."""
+        pool = ConnectionPool(self.per_host)
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(url: str) -> LinkResult:
+            async with limit:
+                return await self.check(pool, url)
+
+        try:
+            return await asyncio.gather(*(bounded(url) for url in urls))
+        finally:
+            pool.close()
+
+
+def check_links(urls: Iterable[str], **options) -> List[LinkResult]:
+    """Check URLs concurrently, options go to LinkChecker."""
+    return asyncio.run(LinkChecker(**options).check_all(urls))
+
+
+def broken(results: Iterable[LinkResult]) -> List[LinkResult]:
+    return [result for result in results if not result.ok]
@@ -1,5 +1,14 @@
+import io
+import os
 import re
+import time
+from itertools import zip_longest
 from pathlib import Path
+from typing import IO, Iterator, List, Tuple, Union
+from xml.etree.ElementTree import Element, ParseError, iterparse
+from xml.sax.saxutils import escape
+
+from . import metrics
 
 
 # Remove XML record tags and insert IRBIS delimiters
@@ -23,8 +32,107 @@ def is_marc(text: str) -> bool:
         return all(marker in str(text) for marker in ('<', '>', '</', 'record'))
 
 
-def convert(text: str) -> str:
+def convert_with_regexes(text: str) -> str:
     """Remove XML tags and insert IRBIS delimiters with a set of regexes"""
     for pattern, replacement in MARC_TO_IRBIS_REGEXES:
         text = pattern.sub(replacement, text)
     return text
+
+
+def _local(tag: str) -> str:
+    """Tag name without namespace."""
+    return tag.rpartition('}')[2]
+
+
+def _escaped(text: Union[str, None]) -> str:
+    """Put back &amp;, &lt; and &gt; for the text the parser decoded.
+    This is not always the text of the XML: see differences() for what isn't.
+    """
+    return escape(text) if text else ''
+
+
+def record_to_irbis(record: Element) -> str:
+    """Turn one <record> element into IRBIS text (no trailing '*****')."""
+    lines = []
+    for field in record:
+        if _local(field.tag) != 'field':
+            continue  # leader and such
+        parts = [f"#{field.get('id')}: ", _escaped(field.text)]
+        for child in field:
+            if _local(child.tag) == 'subfield':
+                parts.append(f"^{child.get('id')}{_escaped(child.text)}")
+            # Text between subfields stays, as with the regexes
+            parts.append(_escaped(child.tail))
+        lines.append(''.join(parts))
+    return '\n'.join(lines)
+
+
+def iter_convert(source: Union[os.PathLike, str, IO]) -> Iterator[str]:
+    """Convert MARCXML to IRBIS records one at a time in a single pass.
+    Every record element is cleared as soon as it is converted,
+    so memory is bounded by the biggest record, not by the file.
+    source: path or binary/text file object.
+    """
+    if metrics.current is not None:
+        return metrics.timed(
+            metrics.current, 'iter_convert', _iter_convert(source), metrics.file_size(source))
+    return _iter_convert(source)
+
+
+def _iter_convert(source: Union[os.PathLike, str, IO]) -> Iterator[str]:
+    context = iterparse(source, events=('start', 'end'))
+    root = None
+    for event, elem in context:
+        if root is None:
+            root = elem
+        if event == 'end' and _local(elem.tag) == 'record':
+            yield record_to_irbis(elem)
+            elem.clear()
+            # Drop already converted records from the document tree
+            if root is not elem:
+                root.clear()
+
+
+def convert(text: str, streaming: bool = False) -> str:
+    """Convert MARCXML text to IRBIS text with the regexes.
+    streaming=True uses the streaming parser instead (falling back to the
+    regexes for input that is not well-formed XML, e.g. bare concatenated
+    records). Its output is not the regexes' for every input, see differences().
+    """
+    if metrics.current is not None:
+        start = time.perf_counter()
+        result = _convert(text, streaming)
+        metrics.current.add(
+            'convert', time.perf_counter() - start, metrics.size(text), metrics.size(result))
+        return result
+    return _convert(text, streaming)
+
+
+def _convert(text: str, streaming: bool) -> str:
+    if not streaming:
+        return convert_with_regexes(text)
+    try:
+        return ''.join(
+            record + '\n*****\n'
+            for record in iter_convert(io.StringIO(text))
+        )
+    except ParseError:
+        return convert_with_regexes(text)
+
+
+def differences(text: str) -> List[Tuple[str, str]]:
+    """(regexes, streaming parser) pairs of output lines that differ for text.
+    Lines the regexes leave outside records (XML declaration, root tags) are skipped.
+    The parser decodes entities and only &amp;, &lt; and &gt; are put back, so the
+    streaming output differs where the XML has
+    - &quot; or &apos;: they come out as " and ' (tidy turns &quot; into " anyway),
+    - character references like &#1040;: they come out as the characters,
+    - a literal >: it comes out as &gt;.
+    """
+    def lines(irbis: str) -> List[str]:
+        return [line for line in irbis.splitlines() if line and not line.startswith('<')]
+    return [
+        (old, new) for old, new in zip_longest(
+            lines(convert_with_regexes(text)), lines(convert(text, streaming=True))
+        ) if old != new
+    ]
@@ -0,0 +1,145 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+
+class StageStats:
+    """Totals for one stage or rule. Sizes are UTF-8 bytes."""
+
+    __slots__ = ('calls', 'seconds', 'bytes_in', 'bytes_out', 'substitutions')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.substitutions = 0
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Metrics:
+    """Stats by name: 'outof', 'tidy', 'tidy:initials', 'convert', 'select'...
+    Collected only while enabled (see collect), so the hot paths cost
+    one None check per call when nobody is looking.
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, StageStats] = {}
+
+    def __getitem__(self, name: str) -> StageStats:
+        return self.stages[name]
+
+    def stage(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return stats
+
+    def add(
+        self,
+        name: str,
+        seconds: float,
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+        substitutions: int = 0,
+        calls: int = 1,
+    ) -> None:
+        stats = self.stage(name)
+        stats.calls += calls
+        stats.seconds += seconds
+        stats.bytes_in += bytes_in
+        stats.bytes_out += bytes_out
+        stats.substitutions += substitutions
+
+    def to_dict(self) -> dict:
+        return {name: stats.to_dict() for name, stats in self.stages.items()}
+
+    def save(self, path: Union[os.PathLike, str]) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+
+    def report(self) -> str:
+        """Table for the console, slowest first."""
+        lines = [f"{'stage':<24}{'calls':>10}{'seconds':>10}{'MB in':>10}{'MB out':>10}{'subs':>10}"]
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+            lines.append(
+                f'{name:<24}{stats.calls:>10}{stats.seconds:>10.3f}'
+                f'{stats.bytes_in / 1e6:>10.2f}{stats.bytes_out / 1e6:>10.2f}{stats.substitutions:>10}'
+            )
+        return '\n'.join(lines)
+
+
+# The Metrics being collected, None when off
+current: Optional[Metrics] = None
+
+
+@contextmanager
+def collect(metrics: Optional[Metrics] = None) -> Iterator[Metrics]:
+    """with collect() as stats: ... - everything run inside is measured."""
+    global current
+    previous = current
+    current = Metrics() if metrics is None else metrics
+    try:
+        yield current
+    finally:
+        current = previous
+
+
+def size(text: Union[str, bytes, None]) -> int:
+    if not text:
+        return 0
+    return len(text) if isinstance(text, (bytes, bytearray)) else len(text.encode('utf-8', errors='ignore'))
+
+
+def file_size(file) -> int:
+    try:
+        return os.path.getsize(file)
+    except (OSError, TypeError, ValueError):
+        return 0
+
+
+class Upstream:
+    """Iterate items, keeping how long pulling them took and their total size,
+    so a consumer can leave the work done upstream out of its own time.
+    """
+
+    def __init__(self, items: Iterable) -> None:
+        self.items = iter(items)
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def __iter__(self) -> 'Upstream':
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self.items)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.bytes += size(item)
+        return item
+
+
+def timed(metrics: Metrics, name: str, items: Iterable, bytes_in: int = 0) -> Iterator:
+    """Pass items through, adding the time to produce each one (one call per item)
+    and its size as output to the stage name.
+    """
+    stats = metrics.stage(name)
+    stats.bytes_in += bytes_in
+    items = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            stats.seconds += time.perf_counter() - start
+            return
+        stats.seconds += time.perf_counter() - start
+        stats.calls += 1
+        stats.bytes_out += size(item)
+        yield item
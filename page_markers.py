@@ -0,0 +1,67 @@
+import codecs
+import re
+from typing import Dict, Iterable, NamedTuple, Optional, Pattern
+
+
+OVERLAP = 1024  # characters kept between chunks so a marker cut in two is still found
+MAX_PAGE_BYTES = 2 << 20  # a page without a decision by then is taken as broken
+
+
+class SiteRule(NamedTuple):
+    """How to tell from raw HTML whether a book can be read on a site.
+    found: marker of the read link; ruled_out: marker showing it won't come
+    (a "not available" block, or a landmark the link never comes after);
+    max_bytes: how much to read at most when neither shows up.
+    """
+    found: Pattern
+    ruled_out: Optional[Pattern] = None
+    max_bytes: int = MAX_PAGE_BYTES
+
+
+# Key is a piece of the URL, as in 'znanium' in url
+SITE_RULES: Dict[str, SiteRule] = {
+    # "Читать книгу" link or its hover title; the book card is over by the footer
+    'znanium': SiteRule(
+        re.compile(
+            r'<a\b[^>]*>Читать книгу</a>'
+            r'|<span\b[^>]*\bclass="(?:[^"]*\s)?hover_title(?:\s[^"]*)?"[^>]*>Читать книгу</span>'
+        ),
+        re.compile(r'<footer\b'),
+    ),
+    'ibooks': SiteRule(
+        re.compile(r'<a\b[^>]*\bclass=["\']btn btn--small["\']'),
+        re.compile(r'<footer\b'),
+    ),
+}
+
+
+def register_site(key: str, rule: SiteRule) -> None:
+    SITE_RULES[key] = rule
+
+
+def rule_for(url: str) -> SiteRule:
+    for key, rule in SITE_RULES.items():
+        if key in url:
+            return rule
+    raise ValueError(f'No site rule for {url}')
+
+
+def scan(chunks: Iterable[bytes], rule: SiteRule, encoding: Optional[str] = None) -> bool:
+    """Look for the markers in a page coming in chunks.
+    Stops at the first chunk that decides, so the rest needn't be downloaded,
+    and gives up (False) after rule.max_bytes.
+    """
+    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    tail = ''
+    read = 0
+    for chunk in chunks:
+        read += len(chunk)
+        if read > rule.max_bytes:
+            return False
+        text = tail + decoder.decode(chunk)
+        if rule.found.search(text):
+            return True
+        if rule.ruled_out is not None and rule.ruled_out.search(text):
+            return False
+        tail = text[-OVERLAP:]
+    return False
@@ -0,0 +1,191 @@
+import argparse
+import io
+import re
+import sys
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from . import get_text, marc_to_irbis, metrics
+from .get_text import RECORD_SEPARATOR
+from .record import Record
+from .select_records import TermMatcher, load_terms
+from .tidy import tidy_text
+
+
+# First field line of a record: what comes before it in converted text is XML
+FIELD_LINE = re.compile(r'^#\d+:', re.M)
+
+class Stage:
+    """One step of a pipeline: a generator over single records, timed.
+    Time spent pulling records from the previous stage is not counted.
+    """
+
+    def __init__(self, name: str, step: Callable[[Iterable[str]], Iterator[str]]) -> None:
+        self.name = name
+        self.step = step
+        self.upstream: Optional['Stage'] = None
+        self.total = 0.0  # own time plus everything upstream
+        self.records_in = 0
+        self.records_out = 0
+
+    @property
+    def seconds(self) -> float:
+        return self.total - (self.upstream.total if self.upstream else 0.0)
+
+    def _counted(self, records: Iterable[str]) -> Iterator[str]:
+        for record in records:
+            self.records_in += 1
+            yield record
+
+    def run(self, records: Iterable[str]) -> Iterator[str]:
+        outputs = self.step(self._counted(records))
+        while True:
+            start = time.perf_counter()
+            try:
+                record = next(outputs)
+            except StopIteration:
+                return
+            finally:
+                self.total += time.perf_counter() - start
+            self.records_out += 1
+            yield record
+
+
+# ===== Stages =====
+def read_stage(file: str, marc: bool = False, stream: bool = False) -> Stage:
+    """Records of an IRBIS text file, or of a converted MARCXML file.
+    MARCXML is converted with the regexes, or with stream on the fly
+    by the streaming parser (see marc_to_irbis.differences).
+    """
+    # A generator, so converting the whole file is timed as this stage's work
+    def read(_: Iterable[str]) -> Iterator[str]:
+        if marc and stream:
+            records = marc_to_irbis.iter_convert(file)
+        elif marc:
+            text = get_text.outof(file, 'to string')
+            records = _fields_only(
+                get_text.iter_records(io.StringIO(marc_to_irbis.convert(text)))
+            )
+        else:
+            records = get_text.outof(file, 'iter records')
+        yield from (record for record in records if record)
+    return Stage('convert' if marc else 'read', read)
+
+
+def _fields_only(records: Iterable[str]) -> Iterator[str]:
+    """Converted records from their first field line on. The regexes leave
+    the XML declaration and root tags in the text: pieces with no fields
+    (like the closing '</records>') are dropped.
+    """
+    for record in records:
+        first = FIELD_LINE.search(record)
+        if first:
+            yield record[first.start():]
+
+
+def tidy_stage(**options) -> Stage:
+    def tidy(records: Iterable[str]) -> Iterator[str]:
+        for record in records:
+            # The separator is where tidy_text adds default fields
+            order = tidy_text(f'{record}\n{RECORD_SEPARATOR}', **options)
+            yield order[:-len(RECORD_SEPARATOR)].rstrip('\n')
+    return Stage('tidy', tidy)
+
+
+def select_stage(mode: str, terms: Iterable) -> Stage:
+    weneed = TermMatcher(terms)
+    keep = mode == 'with'
+    def select(records: Iterable[str]) -> Iterator[str]:
+        return (record for record in records if weneed(record) == keep)
+    return Stage(f'select {mode}', select)
+
+
+def drop_stage(tags: Iterable[str]) -> Stage:
+    """Remove fields by tag ('001' or '#001:')."""
+    tags = [tag.strip().strip('#:') for tag in tags]
+    def drop(records: Iterable[str]) -> Iterator[str]:
+        for record in records:
+            parsed = Record(record)
+            parsed.remove(*tags)
+            yield str(parsed)
+    return Stage('remove fields', drop)
+
+
+def run(stages: List[Stage], output: str) -> List[Stage]:
+    """Chain stages and write the result in one pass."""
+    records: Iterable[str] = ()
+    previous = None
+    for stage in stages:
+        stage.upstream = previous
+        records = stage.run(records)
+        previous = stage
+    start = time.perf_counter()
+    get_text.into(output, 'from iter', records)
+    write = time.perf_counter() - start - (previous.total if previous else 0.0)
+    report(stages, write)
+    if metrics.current is not None:
+        for stage in stages:
+            metrics.current.add(f'run:{stage.name}', stage.seconds, calls=stage.records_in)
+        metrics.current.add('run:write', write)
+    return stages
+
+
+def report(stages: List[Stage], write: float) -> None:
+    print(f"{'stage':<16}{'records in':>12}{'records out':>12}{'seconds':>10}")
+    for stage in stages:
+        print(f'{stage.name:<16}{stage.records_in:>12}{stage.records_out:>12}{stage.seconds:>10.2f}')
+    print(f"{'write':<16}{'':>12}{'':>12}{write:>10.2f}")
+
+
+# ===== Command line =====
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='irma run',
+        description='Convert, tidy, select and remove fields in one streaming pass.'
+    )
+    parser.add_argument('input', help='IRBIS text file or MARCXML file (with --marc)')
+    parser.add_argument('-o', '--output', required=True, help='file to write')
+    parser.add_argument('--marc', action='store_true', help='input is MARCXML')
+    parser.add_argument('--stream', action='store_true',
+                        help='convert MARCXML with the streaming parser instead of the regexes '
+                             '(&quot;, &apos;, &#NNN; and a literal > come out differently)')
+    parser.add_argument('--tidy', action='store_true', help='clean records with tidy rules')
+    parser.add_argument('--with', dest='with_terms', metavar='TERMS',
+                        help='keep only records with any term from a .txt/.json file')
+    parser.add_argument('--without', dest='without_terms', metavar='TERMS',
+                        help='drop records with any term from a .txt/.json file')
+    parser.add_argument('--drop', metavar='TAGS',
+                        help='comma-separated tags of fields to remove, e.g. 001,005')
+    parser.add_argument('--metrics', nargs='?', const='', metavar='JSON',
+                        help='print time and sizes per stage and tidy rule, '
+                             'and save them to JSON if a file is given')
+    return parser
+
+
+def stages_from(args: argparse.Namespace) -> List[Stage]:
+    stages = [read_stage(args.input, args.marc, args.stream)]
+    if args.tidy:
+        stages.append(tidy_stage())
+    if args.with_terms:
+        stages.append(select_stage('with', load_terms(args.with_terms)))
+    if args.without_terms:
+        stages.append(select_stage('without', load_terms(args.without_terms)))
+    if args.drop:
+        stages.append(drop_stage(args.drop.split(',')))
+    return stages
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    if args.metrics is None:
+        run(stages_from(args), args.output)
+        return
+    with metrics.collect() as stats:
+        run(stages_from(args), args.output)
+    print(stats.report())
+    if args.metrics:
+        stats.save(args.metrics)
+
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    main()
@@ -0,0 +1,161 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+def parse_subfields(value: str) -> Dict[str, List[str]]:
+    """Split a field value into its ^X subfields.
+    Text before the first ^ (unmarked value) goes under ''.
+    Subfield codes are uppercased: IRBIS treats them case-insensitively.
+    """
+    subfields: Dict[str, List[str]] = {}
+    head, *parts = value.split('^')
+    if head:
+        subfields.setdefault('', []).append(head)
+    for part in parts:
+        if part:
+            subfields.setdefault(part[0].upper(), []).append(part[1:])
+    return subfields
+
+
+def normalize_tag(tag: str) -> str:
+    """'010', '#010:' and '10' are one tag: IRBIS writes it as '#10:'."""
+    tag = tag.strip().strip('#:')
+    return str(int(tag)) if tag.isdigit() else tag
+
+
+def split_line(line: str) -> Optional[tuple]:
+    """Return (tag, value) for a '#NNN: value' line, None for anything else."""
+    if not line.startswith('#'):
+        return None
+    tag, sep, value = line[1:].partition(':')
+    if not sep or not tag.isdigit():
+        return None
+    return tag, value[1:] if value.startswith(' ') else value
+
+
+class Record:
+    """One IRBIS record, parsed into a tag index on first access.
+
+    Tags are given with or without leading zeros, '#' and ':'
+    ('010', '10' and '#10:' are the same field).
+    Until a field is changed, str(record) returns the original text as is.
+    """
+    __slots__ = ('_text', '_lines', '_index', '_subfields', '_dirty')
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+        self._lines: Optional[List[str]] = None
+        self._index: Optional[Dict[str, List[int]]] = None
+        # line number -> parsed subfields, filled by subfields()
+        self._subfields: Dict[int, Dict[str, List[str]]] = {}
+        self._dirty = False
+
+    # ===== Parsing =====
+    def _parse(self) -> Dict[str, List[int]]:
+        """Build tag -> line numbers index once."""
+        if self._index is None:
+            if self._lines is None:
+                self._lines = self._text.splitlines()
+            self._index = {}
+            for i, line in enumerate(self._lines):
+                parsed = split_line(line)
+                if parsed:
+                    self._index.setdefault(normalize_tag(parsed[0]), []).append(i)
+        return self._index
+
+    def _value(self, i: int) -> str:
+        return split_line(self._lines[i])[1]
+
+    def _parsed_subfields(self, i: int) -> Dict[str, List[str]]:
+        subfields = self._subfields.get(i)
+        if subfields is None:
+            subfields = self._subfields[i] = parse_subfields(self._value(i))
+        return subfields
+
+    # ===== Lookup =====
+    def __contains__(self, tag: str) -> bool:
+        return normalize_tag(tag) in self._parse()
+
+    def __iter__(self) -> Iterator[tuple]:
+        """Iterate (tag, value) over fields in record order, tags normalized."""
+        self._parse()
+        for line in self._lines:
+            parsed = split_line(line)
+            if parsed:
+                yield normalize_tag(parsed[0]), parsed[1]
+
+    @property
+    def tags(self) -> List[str]:
+        return list(self._parse())
+
+    def fields(self, tag: str) -> List[str]:
+        """Values of all occurrences of a tag."""
+        return [self._value(i) for i in self._parse().get(normalize_tag(tag), ())]
+
+    def subfields(self, tag: str, code: str) -> List[str]:
+        """Values of subfield ^code in all occurrences of a tag."""
+        code = code.upper()
+        return [
+            value
+            for i in self._parse().get(normalize_tag(tag), ())
+            for value in self._parsed_subfields(i).get(code, ())
+        ]
+
+    def get(self, tag: str, code: Optional[str] = None, default=None):
+        """First value of a field (or of its subfield if code is given)."""
+        values = self.subfields(tag, code) if code is not None else self.fields(tag)
+        return values[0] if values else default
+
+    # ===== Editing =====
+    def set(self, tag: str, value: str, occurrence: int = 0) -> None:
+        """Replace one occurrence of a field, add the field if it's missing."""
+        tag = normalize_tag(tag)
+        index = self._parse()
+        if tag not in index or occurrence >= len(index[tag]):
+            self.add(tag, value)
+            return
+        i = index[tag][occurrence]
+        self._lines[i] = f'#{tag}: {value}'
+        self._subfields.pop(i, None)
+        self._dirty = True
+
+    def add(self, tag: str, value: str) -> None:
+        """Append a new occurrence of a field to the end of the record."""
+        tag = normalize_tag(tag)
+        index = self._parse()
+        index.setdefault(tag, []).append(len(self._lines))
+        self._lines.append(f'#{tag}: {value}')
+        self._dirty = True
+
+    def remove(self, *tags: str) -> int:
+        """Drop all occurrences of given tags. Returns number of lines dropped."""
+        index = self._parse()
+        doomed = {i for tag in tags for i in index.get(normalize_tag(tag), ())}
+        if not doomed:
+            return 0
+        self._lines = [line for i, line in enumerate(self._lines) if i not in doomed]
+        self._index = None
+        self._subfields = {}
+        self._dirty = True
+        return len(doomed)
+
+    # ===== Output =====
+    def __str__(self) -> str:
+        if self._dirty:
+            self._text = '\n'.join(self._lines)
+            self._dirty = False
+        return self._text
+
+    def __repr__(self) -> str:
+        return f'Record({str(self)[:60]!r})'
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Record):
+            return str(self) == str(other)
+        return NotImplemented
+
+    __hash__ = None
+
+
+def records_from(texts: Iterable[str]) -> Iterator[Record]:
+    """Wrap raw record strings (e.g. from get_text.outof) into Records."""
+    return (Record(text) for text in texts)
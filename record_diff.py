@@ -0,0 +1,121 @@
+import hashlib
+import os
+from collections import Counter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .get_text import iter_raw_records
+from .record import Record, normalize_tag
+
+
+VOLATILE_FIELDS = ('907', '910', '999')
+
+
+class FieldChanges(NamedTuple):
+    """Fields (as (tag, value)) only in the old or only in the new record."""
+    removed: List[Tuple[str, str]]
+    added: List[Tuple[str, str]]
+
+
+class Difference(NamedTuple):
+    kind: str  # 'added', 'removed' or 'changed'
+    key: str
+    fields: Optional[FieldChanges] = None
+
+
+def parse_key(spec: str) -> Tuple[str, Optional[str]]:
+    """'#903' -> ('903', None), '#10^A' -> ('10', 'A')."""
+    tag, _, code = spec.lstrip('#').partition('^')
+    return tag.rstrip(':'), code or None
+
+
+def _decode(raw: bytes) -> Record:
+    return Record(raw.decode('utf-8', errors='ignore').strip('\n\r*'))
+
+
+def _fields(record: Record, ignore: Tuple[str, ...]) -> List[Tuple[str, str]]:
+    ignore = {normalize_tag(tag) for tag in ignore}
+    return [(tag, value.strip()) for tag, value in record if tag not in ignore]
+
+
+def fingerprint(record: Record, ignore: Tuple[str, ...] = VOLATILE_FIELDS) -> bytes:
+    """Hash of the record's fields, not depending on their order or volatile fields."""
+    fields = sorted(_fields(record, ignore))
+    return hashlib.blake2b(repr(fields).encode(), digest_size=16).digest()
+
+
+def _keyed(
+    file: Union[os.PathLike, str],
+    key: Tuple[str, Optional[str]],
+) -> Iterator[Tuple[str, int, Record]]:
+    """Yield (key value, byte offset, record) for records that have the key."""
+    tag, code = key
+    with open(file, 'rb') as f:
+        for offset, raw in iter_raw_records(f):
+            record = _decode(raw)
+            value = record.get(tag, code)
+            if value:
+                yield value.strip(), offset, record
+
+
+def _read_at(f, offset: int) -> Record:
+    """Read back the record starting at a byte offset."""
+    f.seek(offset)
+    _, raw = next(iter_raw_records(f, 64 * 1024))
+    return _decode(raw)
+
+
+def field_changes(old: Record, new: Record, ignore: Tuple[str, ...] = VOLATILE_FIELDS) -> FieldChanges:
+    old_fields, new_fields = Counter(_fields(old, ignore)), Counter(_fields(new, ignore))
+    return FieldChanges(
+        sorted((old_fields - new_fields).elements()),
+        sorted((new_fields - old_fields).elements()),
+    )
+
+
+def iter_diff(
+    old_file: Union[os.PathLike, str],
+    new_file: Union[os.PathLike, str],
+    key: str = '#903',
+    ignore: Tuple[str, ...] = VOLATILE_FIELDS,
+) -> Iterator[Difference]:
+    """Compare two exports record by record, matched by the key field.
+    One pass over each file; only keys, fingerprints and offsets of
+    the old file are kept in memory. Changed old records are re-read by offset.
+    """
+    key = parse_key(key)
+    seen: Dict[str, Tuple[bytes, int]] = {}
+    for value, offset, record in _keyed(old_file, key):
+        seen.setdefault(value, (fingerprint(record, ignore), offset))
+
+    matched = set()
+    with open(old_file, 'rb') as old:
+        for value, _, record in _keyed(new_file, key):
+            if value in matched:
+                continue
+            matched.add(value)
+            if value not in seen:
+                yield Difference('added', value)
+                continue
+            old_print, old_offset = seen[value]
+            if fingerprint(record, ignore) != old_print:
+                old_record = _read_at(old, old_offset)
+                yield Difference('changed', value, field_changes(old_record, record, ignore))
+
+    for value in seen:
+        if value not in matched:
+            yield Difference('removed', value)
+
+
+def diff(
+    old_file: Union[os.PathLike, str],
+    new_file: Union[os.PathLike, str],
+    key: str = '#903',
+    ignore: Tuple[str, ...] = VOLATILE_FIELDS,
+) -> Dict[str, List[Difference]]:
+    """iter_diff collected by kind, with a summary printed."""
+    report: Dict[str, List[Difference]] = {'added': [], 'removed': [], 'changed': []}
+    for difference in iter_diff(old_file, new_file, key, ignore):
+        report[difference.kind].append(difference)
+    print(f"Added: {len(report['added'])}, removed: {len(report['removed'])}, "
+          f"changed: {len(report['changed'])}")
+    return report
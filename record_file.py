@@ -0,0 +1,134 @@
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+from .bytes_filter import close_map, map_file
+from .get_text import RECORD_SEPARATOR
+from .record import Record
+
+
+OFFSETS_SUFFIX = '.offsets'
+# magic, file size, file mtime (ns), number of records
+HEADER = struct.Struct('<8sQQQ')
+MAGIC = b'IRMAOFS1'
+
+
+class RecordFile:
+    """Random access to the records of a big export through mmap.
+
+    records[i] is the same string as outof(file, 'to records')[i],
+    but only that record is read and decoded. Record start/end offsets
+    live in compact array('Q') and are cached in a sidecar file that
+    is rebuilt when the export's size or mtime changes.
+    """
+
+    def __init__(
+        self,
+        file: Union[os.PathLike, str],
+        offsets_file: Optional[Union[os.PathLike, str]] = None,
+    ) -> None:
+        self.file = Path(file)
+        self.offsets_file = Path(offsets_file or f'{file}{OFFSETS_SUFFIX}')
+        self._f = open(self.file, 'rb')
+        self._mm = map_file(self._f)
+        self._lookup: Dict[tuple, Dict[str, int]] = {}
+        if not self._load():
+            self._build()
+            self._save()
+
+    # ===== Offsets =====
+    def _signature(self) -> tuple:
+        stat = self.file.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def _build(self) -> None:
+        """Find all separators with mmap.find (runs in C)."""
+        separator = RECORD_SEPARATOR.encode()
+        self.starts, self.ends = array('Q'), array('Q')
+        start = 0
+        while (end := self._mm.find(separator, start)) != -1:
+            self.starts.append(start)
+            self.ends.append(end)
+            start = end + len(separator)
+        self.starts.append(start)
+        self.ends.append(len(self._mm))
+
+    def _load(self) -> bool:
+        try:
+            with open(self.offsets_file, 'rb') as f:
+                magic, size, mtime, count = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC or (size, mtime) != self._signature():
+                    return False
+                self.starts, self.ends = array('Q'), array('Q')
+                self.starts.fromfile(f, count)
+                self.ends.fromfile(f, count)
+                return True
+        except (OSError, EOFError, struct.error):
+            return False
+
+    def _save(self) -> None:
+        try:
+            with open(self.offsets_file, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, *self._signature(), len(self.starts)))
+                self.starts.tofile(f)
+                self.ends.tofile(f)
+        except OSError:
+            pass  # read-only place: offsets are rebuilt next time
+
+    # ===== Access =====
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def raw(self, i: int) -> memoryview:
+        """Bytes of record i without copying (separators excluded)."""
+        return memoryview(self._mm)[self.starts[i]:self.ends[i]]
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('record index out of range')
+        text = str(self.raw(i), 'utf-8', errors='ignore')
+        # Line breaks as text mode reads them, so CRLF exports give the same strings
+        return text.replace('\r\n', '\n').replace('\r', '\n').strip('\n*')
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+    def record(self, i: int) -> Record:
+        return Record(self[i])
+
+    def by_mfn(self, mfn: int) -> str:
+        """Record by MFN, taken as its 1-based position in the file.
+        That holds only for a full export of a database without deleted
+        records; otherwise find the record by a field instead (see find).
+        """
+        return self[mfn - 1]
+
+    def find(self, tag: str = '903', value: str = '', code: Optional[str] = None) -> Optional[str]:
+        """Record whose field (or subfield) equals value, e.g. find('903', 'ID-123').
+        The value -> record table is built on first use and kept in memory.
+        """
+        key = (tag, code)
+        if key not in self._lookup:
+            table = self._lookup[key] = {}
+            for i in range(len(self)):
+                found = self.record(i).get(tag, code)
+                if found is not None:
+                    table.setdefault(found.strip(), i)
+        i = self._lookup[key].get(value.strip())
+        return None if i is None else self[i]
+
+    def close(self) -> None:
+        close_map(self._mm)
+        self._f.close()
+
+    def __enter__(self) -> 'RecordFile':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,175 @@
+import queue
+import threading
+from typing import Callable, Iterable, List, Protocol
+
+from tqdm import tqdm
+
+
+# Multiple ways to detect the "Read" button
+READ_BUTTON_SELECTORS = [
+    ("CSS", "ebs-book-read-button button.button-read"),  # Component structure
+    ("XPATH", "//button[contains(@class,'button-read') and contains(.,'Читать')]"),
+    ("XPATH", "//ebs-book-read-button//button[span[contains(text(),'Читать')]]")
+]
+
+
+class Renderer(Protocol):
+    """What the pool needs from a browser. A fake one can stand in for tests."""
+
+    def open(self, url: str) -> None: ...
+    # Returns when the read button is there, or after timeout seconds without it
+    def wait_ready(self, timeout: float) -> None: ...
+    def has_read_link(self) -> bool: ...
+    def alive(self) -> bool: ...
+    def screenshot(self, path: str) -> None: ...
+    def quit(self) -> None: ...
+
+
+class FirefoxRenderer:
+    """Headless Firefox without images, fonts and media, and without implicit waits."""
+
+    def __init__(self) -> None:
+        from selenium import webdriver
+
+        options = webdriver.FirefoxOptions()
+        options.set_preference("dom.webdriver.enabled", False)
+        options.set_preference("permissions.default.image", 2)
+        options.set_preference("gfx.downloadable_fonts.enabled", False)
+        options.set_preference("media.autoplay.default", 5)
+        options.set_preference("media.mediasource.enabled", False)
+        options.set_preference("media.play-stand-alone", False)
+        options.add_argument("-headless")
+        self.driver = webdriver.Firefox(options=options)
+        # Missing elements must be reported at once, not after a timeout
+        self.driver.implicitly_wait(0)
+
+    def open(self, url: str) -> None:
+        self.driver.get(url)
+
+    def wait_ready(self, timeout: float) -> None:
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        # The read button is rendered by the JS app after the page shell
+        # (headings and all), so nothing short of the button itself shows
+        # the page is done: without it, it's given the whole timeout
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.25).until(
+                lambda d: self.has_read_link())
+        except TimeoutException:
+            pass
+
+    def has_read_link(self) -> bool:
+        from selenium.webdriver.common.by import By
+
+        for by, selector in READ_BUTTON_SELECTORS:
+            try:
+                buttons = self.driver.find_elements(
+                    (By.CSS_SELECTOR if by == "CSS" else By.XPATH), selector)
+            except Exception:
+                continue
+            if any(button.is_displayed() for button in buttons):
+                return True
+        return False
+
+    def alive(self) -> bool:
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def screenshot(self, path: str) -> None:
+        self.driver.save_screenshot(path)
+
+    def quit(self) -> None:
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+
+class RenderPool:
+    """N reusable renderers checking pages concurrently, one thread each.
+    A renderer that crashes is replaced and the page is tried once more.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Renderer] = FirefoxRenderer,
+        workers: int = 4,
+        timeout: float = 15,
+        screenshots: bool = True,
+    ) -> None:
+        self.factory = factory
+        self.workers = workers
+        self.timeout = timeout
+        self.screenshots = screenshots
+        self.restarts = 0
+        self._lock = threading.Lock()
+
+    def _check(self, renderer: Renderer, url: str) -> dict:
+        renderer.open(url)
+        renderer.wait_ready(self.timeout)
+        return {"url": url, "has_read_link": renderer.has_read_link()}
+
+    def _drop(self, renderer: Renderer) -> None:
+        """Quit a crashed renderer, a fresh one is started when needed."""
+        renderer.quit()
+        with self._lock:
+            self.restarts += 1
+
+    def _work(self, tasks: queue.Queue, results: list, progress) -> None:
+        renderer = None
+        try:
+            while True:
+                try:
+                    i, url = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                result = {"url": url, "has_read_link": None}
+                for attempt in range(2):
+                    try:
+                        if renderer is None:
+                            renderer = self.factory()
+                        result = self._check(renderer, url)
+                        break
+                    except Exception as e:
+                        if renderer is not None and renderer.alive():
+                            # The page is at fault, not the browser
+                            if self.screenshots:
+                                try:
+                                    renderer.screenshot(f"error_{url.split('/')[-1]}.png")
+                                except Exception:
+                                    pass
+                            print(f"Error checking {url}: {str(e)}")
+                            break
+                        if renderer is not None:
+                            self._drop(renderer)
+                            renderer = None
+                        if attempt:
+                            print(f"Error checking {url}: {str(e)}")
+                results[i] = result
+                with self._lock:
+                    progress.update()
+        finally:
+            if renderer is not None:
+                renderer.quit()
+
+    def check(self, urls: Iterable[str]) -> List[dict]:
+        """Results as {'url', 'has_read_link'} dicts, in the order of urls."""
+        urls = list(urls)
+        tasks: queue.Queue = queue.Queue()
+        for task in enumerate(urls):
+            tasks.put(task)
+        results: list = [None] * len(urls)
+        with tqdm(total=len(urls)) as progress:
+            threads = [
+                threading.Thread(target=self._work, args=(tasks, results, progress))
+                for _ in range(min(self.workers, len(urls)))
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return results
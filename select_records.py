@@ -1,46 +1,177 @@
-from typing import Iterable
+from typing import Dict, Iterable, List, Set, Sized
 from pathlib import Path
 import json
+import re
 import sys
+import time
 from tqdm import tqdm
 
+from . import metrics
+from .bytes_filter import encode_terms, filter_records
+
+
+def _trie_pattern(trie: dict) -> str:
+    """Serialize a character trie into a regex where common prefixes are shared,
+    so the regex engine walks the trie instead of trying terms one by one.
+    """
+    # Children before parents, with a stack of our own: the trie of a long
+    # term is as deep as the term is long, too deep to recurse into
+    patterns: Dict[int, str] = {}
+    stack = [(trie, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done:
+            stack.append((node, True))
+            stack.extend((child, False) for char, child in node.items() if char)
+            continue
+        ends_here = '' in node
+        branches = [
+            re.escape(char) + patterns.pop(id(child))
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            pattern = ''
+        elif len(branches) == 1 and not ends_here:
+            pattern = branches[0]
+        else:
+            body = '(?:' + '|'.join(branches) + ')'
+            pattern = body + '?' if ends_here else body
+        patterns[id(node)] = pattern
+    return patterns[id(trie)]
+
+
+class TermMatcher:
+    """All search terms compiled once into a single trie-shaped regex.
+    A record is scanned in one pass no matter how many terms there are.
+
+    A term is a string (must occur in the record) or an iterable of strings
+    (all of them must occur). Terms may be bytes instead, then records
+    are bytes-like too (bytes, memoryview, mmap).
+    """
+
+    def __init__(self, things_to_find: Iterable) -> None:
+        self.singles: Set[str] = set()
+        self.groups: List[tuple] = []
+        self.groups_by_elem: Dict[str, List[int]] = {}
+        shared: Dict[str, int] = {}  # element -> number of groups with it
+        for thing in things_to_find:
+            assert thing, "thing cannot be empty"  # Debug check
+            if isinstance(thing, (str, bytes)):
+                self.singles.add(thing)
+            elif isinstance(thing, Iterable):
+                group = tuple(thing)
+                assert all(group), "thing cannot contain empty elements"
+                for elem in set(group):
+                    shared[elem] = shared.get(elem, 0) + 1
+                self.groups.append(group)
+        # A group can only match where all its elements are found, so it is
+        # enough to look it up by one: the rarest, so that a common element
+        # (a first name in every group) doesn't make every group a candidate
+        for i, group in enumerate(self.groups):
+            rarest = min(group, key=lambda elem: shared[elem])
+            self.groups_by_elem.setdefault(rarest, []).append(i)
+        self.words: Set[str] = self.singles | set(shared)
+        binary = any(isinstance(word, bytes) for word in self.words)
+
+        trie: dict = {}
+        for word in self.words:
+            node = trie
+            # latin-1 maps bytes to chars one to one, and back
+            for char in word.decode('latin-1') if binary else word:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        body = _trie_pattern(trie)
+        if binary:
+            body = body.encode('latin-1')
+        self._any = re.compile(body) if self.words else None
+        # Lookahead finds a match starting at every position (overlaps included)
+        every = b'(?=(%s))' % body if binary else f'(?=({body}))'
+        self._every = re.compile(every) if self.words else None
+
+    def found_in(self, record: str) -> Set[str]:
+        """Every term word that occurs in the record."""
+        found = set()
+        for match in self._every.finditer(record):
+            longest = match.group(1)
+            # Shorter words that are prefixes of the longest one match here too
+            found.update(
+                longest[:end] for end in range(1, len(longest) + 1)
+                if longest[:end] in self.words
+            )
+        return found
+
+    def __call__(self, record: str) -> bool:
+        if self._any is None:
+            return False
+        if not self.groups:
+            return self._any.search(record) is not None
+        found = self.found_in(record)
+        if not self.singles.isdisjoint(found):
+            return True
+        candidates = {i for elem in found for i in self.groups_by_elem.get(elem, ())}
+        return any(
+            all(elem in found for elem in self.groups[i]) for i in candidates
+        )
+
+
+# Load terms from a file
+FILE_FORMATS = {
+    '.txt': lambda f: [line.strip() for line in f.readlines() if line.strip()],
+    '.json': lambda f: list(json.load(f))
+}
+
+
+def load_terms(filename: str | Path) -> list:
+    """Read search terms: one per line (.txt) or a JSON list (.json)."""
+    filename = Path(filename)
+    if filename.suffix not in FILE_FORMATS:
+        raise ValueError(f"Unsupported file format: {filename}")
+    try:
+        with open(filename, encoding='utf-8') as f:
+            return FILE_FORMATS[filename.suffix](f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File {filename} not found")
+
 
 def select_records(
     records: Iterable[str],
     mode: str,
     things_to_find: str | Iterable,
+) -> Iterable[str]:
+    if metrics.current is not None:
+        # A list can be measured beforehand, anything else while it is read
+        upstream = None if isinstance(records, Sized) else metrics.Upstream(records)
+        bytes_in = 0 if upstream else sum(metrics.size(record) for record in records)
+        start = time.perf_counter()
+        new_records = _select_records(upstream or records, mode, things_to_find)
+        seconds = time.perf_counter() - start
+        if upstream:
+            seconds -= upstream.seconds
+            bytes_in = upstream.bytes
+        metrics.current.add(
+            'select', seconds, bytes_in,
+            sum(metrics.size(record) for record in new_records),
+        )
+        return new_records
+    return _select_records(records, mode, things_to_find)
+
+
+def _select_records(
+    records: Iterable[str],
+    mode: str,
+    things_to_find: str | Iterable,
 ) -> Iterable[str]:
     # Validate inputs using assertions (debugging only)
     assert isinstance(records, Iterable), "records must be an iterable"
     assert mode in {"with", "without"}, f"Invalid mode: {mode}. Use 'with' or 'without'"
     assert isinstance(things_to_find, (str, Iterable)), "things_to_find must be str or Iterable"
 
-    def look_for(thing, record):
-        assert thing, "thing cannot be empty"  # Debug check
-        if isinstance(thing, str):
-            return thing in record
-        elif isinstance(thing, Iterable):
-            return all(elem in record for elem in thing)
-        return False
-
-    def weneed(record: str) -> bool:
-        return any(look_for(thing, record) for thing in things_to_find)
-
     # Load from file if things_to_find is str and not Iterable
-    FILE_FORMATS = {
-        '.txt': lambda f: [line.strip() for line in f.readlines()],
-        '.json': lambda f: list(json.load(f))
-    }
-    if isinstance(things_to_find, str):
-        assert isinstance(things_to_find, Path)
-        filename = things_to_find
-        try:
-            with open(filename) as f:
-                things_to_find = FILE_FORMATS[filename.suffix]
-        except KeyError(FILE_FORMATS):
-            raise ValueError(f"Unsupported file format: {filename}")
-        except FileNotFoundError:
-            raise FileNotFoundError(f"File {filename} not found")
+    if isinstance(things_to_find, (str, Path)):
+        things_to_find = load_terms(things_to_find)
+
+    # Compile all terms once instead of looking for each one in each record
+    weneed = TermMatcher(things_to_find)
 
     new_records = []
     
@@ -59,6 +190,31 @@ def select_records(
         print(f'Found {len(new_records)} matching records')
         return new_records
 
+def select_file(
+    file: str | Path,
+    mode: str,
+    things_to_find: str | Iterable,
+    output: str | Path | None = None,
+) -> None:
+    """select_records for a whole file without decoding it: terms are
+    encoded once (in each encoding our exports come in) and kept records are copied as bytes.
+    Writes to output, or back to file.
+    """
+    assert mode in {"with", "without"}, f"Invalid mode: {mode}. Use 'with' or 'without'"
+    if isinstance(things_to_find, (str, Path)):
+        things_to_find = load_terms(things_to_find)
+
+    weneed = TermMatcher(encode_terms(things_to_find))
+    keep = mode == 'with'
+    start = time.perf_counter()
+    filter_records(file, lambda record: weneed(record) == keep, output)
+    if metrics.current is not None:
+        metrics.current.add(
+            'select_file', time.perf_counter() - start,
+            metrics.file_size(file), metrics.file_size(output or file),
+        )
+
+
 if __name__ == "__main__" and len(sys.argv) > 1:
     select_records(*sys.argv[1:4])
 
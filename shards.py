@@ -0,0 +1,177 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from .bytes_filter import mapped
+from .files_together import BUFFER_SIZE, concatenate
+from .get_text import RECORD_SEPARATOR
+
+
+MANIFEST = 'manifest.json'
+WRITE_BATCH = 256  # small files handed to a writer thread at once
+SEPARATOR = f'\n{RECORD_SEPARATOR}'.encode()
+
+
+def output_folder(file: Union[os.PathLike, str], output_dir=None) -> Path:
+    """output_dir, or a folder named like the file next to it
+    (<file>_split if the file has no suffix to drop).
+    """
+    if output_dir:
+        folder = Path(output_dir)
+    else:
+        folder = Path(file).with_suffix('')
+        if folder == Path(file):
+            folder = Path(f'{file}_split')
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def _line_end(mm, position: int) -> int:
+    """Position after the end of the line that position is in."""
+    end = mm.find(b'\n', position)
+    return len(mm) if end == -1 else end + 1
+
+
+def shard_bounds(mm, shards: int, sep: bytes = SEPARATOR) -> List[Tuple[int, int]]:
+    """(start, end) byte ranges of about len(mm) / shards each.
+    Every range except the last ends right after a separator line.
+    """
+    size = len(mm)
+    bounds, start = [], 0
+    for k in range(1, shards):
+        if start >= size:
+            break
+        found = mm.find(sep, max(start, k * size // shards - 1))
+        if found == -1:
+            break
+        end = _line_end(mm, found + len(sep))
+        if end > start:
+            bounds.append((start, end))
+            start = end
+    if start < size or not bounds:
+        bounds.append((start, size))
+    return bounds
+
+
+def _write_range(mm, start: int, end: int, path: Path) -> None:
+    with open(path, 'wb') as f:
+        for position in range(start, end, BUFFER_SIZE):
+            f.write(mm[position:min(position + BUFFER_SIZE, end)])
+
+
+def split_shards(
+    file: Union[os.PathLike, str],
+    shards: int,
+    output_dir: Optional[Union[os.PathLike, str]] = None,
+    workers: int = 4,
+) -> Path:
+    """Split file into shards of about the same size, aligned to records,
+    written in parallel. A manifest with every shard's byte range is
+    saved with them (see join_shards). Returns the manifest's path.
+    """
+    folder = output_folder(file, output_dir)
+    digits = len(str(shards))
+    with mapped(file) as mm:
+        bounds = shard_bounds(mm, shards)
+        entries = [
+            {'file': f'{i:0{digits}d}.txt', 'start': start, 'end': end}
+            for i, (start, end) in enumerate(bounds)
+        ]
+        with ThreadPoolExecutor(workers) as pool:
+            futures = [
+                pool.submit(_write_range, mm, entry['start'], entry['end'], folder / entry['file'])
+                for entry in entries
+            ]
+            for future in futures:
+                future.result()
+
+    manifest = folder / MANIFEST
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump({
+            'source': str(file),
+            'size': bounds[-1][1],
+            'shards': entries,
+        }, f, ensure_ascii=False, indent=1)
+    return manifest
+
+
+def join_shards(
+    folder: Union[os.PathLike, str],
+    output: Union[os.PathLike, str],
+) -> None:
+    """Put shards back together in manifest order."""
+    folder = Path(folder)
+    with open(folder / MANIFEST, encoding='utf-8') as f:
+        entries = json.load(f)['shards']
+    concatenate((folder / entry['file'] for entry in entries), output, sep=b'')
+
+
+def _write_batch(batch: List[Tuple[Path, bytes]]) -> None:
+    for path, data in batch:
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def write_files(files: Iterable[Tuple[Path, bytes]], workers: int = 4) -> int:
+    """Write many small files on a thread pool, WRITE_BATCH per task.
+    Returns how many were written.
+    """
+    pending = deque()
+    batch: List[Tuple[Path, bytes]] = []
+    count = 0
+    with ThreadPoolExecutor(workers) as pool:
+        for item in files:
+            batch.append(item)
+            count += 1
+            if len(batch) >= WRITE_BATCH:
+                pending.append(pool.submit(_write_batch, batch))
+                batch = []
+                # Only a couple of batches per worker wait in memory
+                if len(pending) >= 2 * workers:
+                    pending.popleft().result()
+        if batch:
+            pending.append(pool.submit(_write_batch, batch))
+        while pending:
+            pending.popleft().result()
+    return count
+
+
+def _count(mm, sep: bytes) -> int:
+    count, start = 0, 0
+    while (end := mm.find(sep, start)) != -1:
+        count += 1
+        start = end + len(sep)
+    return count
+
+
+def _pieces(mm, sep: bytes) -> Iterator[bytes]:
+    start = 0
+    while (end := mm.find(sep, start)) != -1:
+        yield mm[start:end]
+        start = end + len(sep)
+    yield mm[start:]
+
+
+def split_records(
+    file: Union[os.PathLike, str],
+    output_dir: Optional[Union[os.PathLike, str]] = None,
+    sep: str = '\n*****',
+    keepsep: bool = True,
+    workers: int = 4,
+) -> int:
+    """One file per piece of file between seps, named by number.
+    The bytes are written as they are, nothing is decoded.
+    Returns the number of files.
+    """
+    folder = output_folder(file, output_dir)
+    sep = sep.encode('utf-8')
+    tail = sep if keepsep else b''
+    with mapped(file) as mm:
+        digits = len(str(_count(mm, sep) + 1))
+        return write_files((
+            (folder / f'{i:0{digits}d}.txt', piece + tail)
+            for i, piece in enumerate(_pieces(mm, sep))
+        ), workers)
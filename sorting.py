@@ -1,21 +1,25 @@
 from irma import get_text
+from irma.external_sort import MEMORY_BUDGET, sort_records
 
 import os
 import sys
 
 
-def sort_one(file):
-    records = get_text.outof(file), 'to records'
-    for record in records:
-        record_lines = sorted(record.splitlines())
-        record = record_lines.joinlines()
-    get_text.into(f'{file}_sorted.txt', 'from records', sorted(records))
+def sort_one(file, exclude=(), budget=MEMORY_BUDGET):
+    """Sort lines inside every record, then the records.
+    Works for files bigger than memory: see external_sort.sort_records.
+    """
+    records = get_text.outof(file, 'iter records')
+    get_text.into(
+        f'{file}_sorted.txt', 'from iter',
+        sort_records(records, exclude, budget=budget)
+    )
 
 
-def sort_many(files):
+def sort_many(files, exclude=(), budget=MEMORY_BUDGET):
     print('Выполняется сортировка...')
     for file in files:
-        sort_one(file)
+        sort_one(file, exclude, budget)
         print(f'{file} отсортирован!')
     print('Готово')
 
@@ -24,7 +28,7 @@ if __name__ == "__main__":
     if len(sys.argv) > 0:
         p = sys.argv[1]
         if os.path.isdir(p):
-            sort_many(p)
+            sort_many(os.path.join(p, f) for f in os.listdir(p))
         elif os.path.isfile(p):
             sort_one(p)
         
\ No newline at end of file
@@ -0,0 +1,22 @@
+import random
+
+from .. import external_sort
+from ..external_sort import normalize_record, sort_records
+
+
+def test_sort_records_spilling_matches_in_memory_sort(monkeypatch):
+    rng = random.Random(1)
+    records = [
+        '\n'.join(f'#{rng.randint(1, 999)}: {rng.random()}' for _ in range(rng.randint(0, 5)))
+        for _ in range(3000)
+    ]
+    spilled = []
+    spill = external_sort._spill
+    monkeypatch.setattr(external_sort, '_spill', lambda *args: spilled.append(1) or spill(*args))
+    monkeypatch.setattr(external_sort, 'BATCH', 7)
+
+    result = list(sort_records(records, exclude=('#5',), budget=2000))
+
+    expected = sorted(filter(None, (normalize_record(record, ('#5',)) for record in records)))
+    assert len(spilled) > 10
+    assert result == expected
@@ -0,0 +1,25 @@
+import io
+import random
+
+import pytest
+
+from ..get_text import RECORD_SEPARATOR, iter_records
+
+
+def split_records(text):
+    """What 'to records' gives for text."""
+    return [record.strip('\n\r*') for record in text.split(RECORD_SEPARATOR)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 5, 6, 7, 64])
+def test_iter_records_any_chunk_boundary(chunk_size):
+    rng = random.Random(chunk_size)
+    pieces = ['*', '**', RECORD_SEPARATOR, '\n', 'a', '#1: x', '#200: ^Aтекст']
+    for _ in range(500):
+        text = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 40)))
+        assert list(iter_records(io.StringIO(text), chunk_size)) == split_records(text)
+
+
+def test_iter_records_record_longer_than_chunks():
+    text = f'#1: {"x" * 10_000}\n{RECORD_SEPARATOR}\n#2: y\n{RECORD_SEPARATOR}\n'
+    assert list(iter_records(io.StringIO(text), 100)) == split_records(text)
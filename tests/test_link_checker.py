@@ -0,0 +1,81 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ..link_checker import check_links
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    flaky = 0
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _send(self, status, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(b'ok')
+
+    def do_HEAD(self):
+        if self.path == '/no-head':
+            self._send(405)
+        else:
+            self.do_GET()
+
+    def do_GET(self):
+        if self.path.startswith('/ok'):
+            self._send(200)
+        elif self.path == '/no-head':
+            self._send(200)
+        elif self.path == '/moved':
+            self._send(301, [('Location', '/ok')])
+        elif self.path == '/flaky':
+            with self.server.lock:
+                Handler.flaky += 1
+                first = Handler.flaky == 1
+            self._send(503 if first else 200, [('Retry-After', '0')])
+        else:
+            self._send(404)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.lock = threading.Lock()
+    httpd.connections = 0
+    Handler.flaky = 0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd, f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_check_links_against_local_server(server):
+    _, base = server
+    urls = [f'{base}/ok', f'{base}/gone', f'{base}/moved', f'{base}/no-head', f'{base}/flaky']
+    results = check_links(urls, backoff=0)
+    assert [result.url for result in results] == urls
+    ok, gone, moved, no_head, flaky = results
+    assert ok.ok and ok.method == 'HEAD'
+    assert not gone.ok and gone.status == 404
+    assert moved.ok and moved.final_url == f'{base}/ok'
+    assert no_head.ok and no_head.method == 'GET'
+    assert flaky.ok and flaky.attempts == 2
+
+
+def test_check_links_reuses_connections(server):
+    httpd, base = server
+    results = check_links([f'{base}/ok{i}' for i in range(200)], per_host=4)
+    assert all(result.ok for result in results)
+    assert httpd.connections <= 4
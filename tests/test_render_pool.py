@@ -0,0 +1,52 @@
+import threading
+
+from ..render_pool import RenderPool
+
+
+class FakeRenderer:
+    """Pages are urls: 'read' has the button, 'crash' kills the browser once,
+    'broken' fails while the browser stays alive."""
+    started = 0
+    crashed = False
+    lock = threading.Lock()
+
+    def __init__(self):
+        with FakeRenderer.lock:
+            FakeRenderer.started += 1
+        self.url = None
+        self.dead = False
+
+    def open(self, url):
+        if url == 'crash' and not FakeRenderer.crashed:
+            FakeRenderer.crashed = self.dead = True
+            raise RuntimeError('browser died')
+        if url == 'broken':
+            raise RuntimeError('bad page')
+        self.url = url
+
+    def wait_ready(self, timeout):
+        pass
+
+    def has_read_link(self):
+        return self.url in ('read', 'crash')
+
+    def alive(self):
+        return not self.dead
+
+    def screenshot(self, path):
+        pass
+
+    def quit(self):
+        pass
+
+
+def test_render_pool_with_fake_renderer():
+    FakeRenderer.started, FakeRenderer.crashed = 0, False
+    urls = ['read', 'none', 'crash', 'broken'] * 5
+    pool = RenderPool(FakeRenderer, workers=3, screenshots=False)
+    results = pool.check(urls)
+    expected = {'read': True, 'none': False, 'crash': True, 'broken': None}
+    assert results == [{'url': url, 'has_read_link': expected[url]} for url in urls]
+    # The crashed browser is replaced once, the others are reused for every page
+    assert pool.restarts == 1
+    assert FakeRenderer.started <= 3 + 1
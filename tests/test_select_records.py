@@ -0,0 +1,44 @@
+import random
+
+from ..select_records import TermMatcher
+
+
+def naive(terms, record):
+    return any(
+        term in record if isinstance(term, (str, bytes)) else all(elem in record for elem in term)
+        for term in terms
+    )
+
+
+def _word(rng, longest):
+    return ''.join(rng.choice('abc') for _ in range(rng.randint(1, longest)))
+
+
+def test_term_matcher_agrees_with_naive_search():
+    rng = random.Random(1)
+    for _ in range(2000):
+        terms = [
+            _word(rng, 4) if rng.random() < 0.5
+            else tuple(_word(rng, 3) for _ in range(rng.randint(1, 3)))
+            for _ in range(rng.randint(1, 6))
+        ]
+        record = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 20)))
+        assert TermMatcher(terms)(record) == naive(terms, record), (terms, record)
+        binary = [
+            term.encode() if isinstance(term, str) else tuple(elem.encode() for elem in term)
+            for term in terms
+        ]
+        assert TermMatcher(binary)(record.encode()) == naive(terms, record)
+
+
+def test_term_matcher_long_term():
+    matcher = TermMatcher(['x' * 1200])
+    assert matcher('y' + 'x' * 1200)
+    assert not matcher('x' * 1199)
+
+
+def test_term_matcher_groups_sharing_an_element():
+    matcher = TermMatcher([(f'978{i:07d}', 'Иван') for i in range(1000)])
+    assert matcher('#10: 9780000005\n#700: Иван')
+    assert not matcher('#700: Иван')
+    assert not matcher('#10: 9780000005')
@@ -1,10 +1,159 @@
+import hashlib
+import os
 import re
+import sqlite3
 import sys
+import time
+from collections import deque
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Union, Iterable
+from typing import TYPE_CHECKING, Dict, List, Optional, Union, Iterable, Iterator
 
-from . import marc_to_irbis
-from .get_text import outof, into
+from . import metrics
+from .get_text import outof, into, iter_record_chunks, RECORD_SEPARATOR
+from .metrics import Metrics
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+
+# ===== Configuration =====
+DEFAULT_FIELDS = (
+    '#920: PAZK', 
+    '#610: ЭБС АЙБУКС',
+    '#900: ^Tl',
+    '#182: ^Ab',
+    '#181: ^Ai'
+)
+
+REPLACEMENTS: Dict[str, str] = {
+    '&quot;': '"',
+    '&amp;': '&',
+    '#856: ^U': '#951: ^I'
+}
+
+# Bump when a rule changes in a way the tables below don't show
+# (e.g. a replacement function): cached results of older rules get ignored
+RULESET_VERSION = 1
+
+# Format: (unique_id, pattern, replacement)
+BASIC_REGEXES = [
+    # Same as capitalizing (?<=\^)([a-zа-я]), but without a lookbehind the search is much faster
+    ('capitalization', re.compile(r'\^[a-zа-я]'), lambda m: m.group().upper()),
+    ('whitespace', re.compile(r'  +'), ' ')
+]
+
+TIDYING_REGEXES = [
+    # Field prefix is matched and put back: same result as a lookbehind,
+    # but a literal prefix lets the regex engine skip straight to it
+    ('#210', re.compile(r'(#210\: )\^C(.+)\^C'), r'\1^C\2\n#210: ^C\''),
+    ('#215', re.compile(r'(#215\: )\^A(\d+) с\.'), r'\1^A\2\''),
+    ('publisher', re.compile(r'\^(.)Издательство \"(.+)\"'), r'\1\2'),
+    ('company', re.compile(r'(?:ООО|АО) \"(.+)\"'), r'\1'),
+    ('ebook_link', re.compile(r'(#951\: \^Ihttps\:\/\/ibooks\.ru\/bookshelf\/\d+)(?:\^Z.+$)*?'), 
+     r'\1^TСсылка на документ в ЭБС Айбукс^H05^4для автор. пользователей'),
+    ('cover_link', re.compile(r'(#951\: \^Ihttps\:\/\/ibooks\.ru\/resize\/w188\/images\/T\/.+)'), 
+     r'\1^TОбложка^H02'),
+    ('initials', re.compile(r'(.)\.(.)\.'), r'\1. \2.')
+]
+
+# Text that every match of a rule contains. If it's not in the text,
+# the rule can't match and its pass is skipped without running the regex.
+TRIGGERS: Dict[str, str] = {
+    'capitalization': '^',
+    'whitespace': '  ',
+    '#210': '#210: ^C',
+    '#215': '#215: ^A',
+    'publisher': 'Издательство "',
+    'company': 'О "',
+    'ebook_link': 'ibooks.ru/bookshelf/',
+    'cover_link': 'ibooks.ru/resize/w188/images/T/',
+    'initials': '.',
+}
+
+
+# ===== Compiling =====
+def _regex_pass(rule: tuple, counted: bool = False):
+    """str -> str pass, or with counted str -> (str, number of substitutions)."""
+    unique_id, pattern, replacement = rule
+    trigger = TRIGGERS.get(unique_id, '')
+
+    if counted:
+        def run_counted(mess: str) -> tuple:
+            return pattern.subn(replacement, mess) if trigger in mess else (mess, 0)
+        return run_counted
+
+    def run(mess: str) -> str:
+        return pattern.sub(replacement, mess) if trigger in mess else mess
+    return run
+
+
+def _replace_pass(old: str, new: str, counted: bool = False):
+    if counted:
+        return lambda mess: (mess.replace(old, new), mess.count(old))
+    return lambda mess: mess.replace(old, new)
+
+
+@lru_cache(maxsize=32)
+def compile_rules(
+    enable_default_fields: bool = True,
+    enable_char_capitalization: bool = True,
+    enable_whitespace_cleanup: bool = True,
+    enable_replacements: Union[bool, tuple] = True,
+    enable_regexes: Union[bool, tuple] = True,
+    counted: bool = False,
+) -> tuple:
+    """Turn an enabled rule set into a tuple of passes (str -> str), in rule order.
+    Cached by configuration, so every set is compiled once per process.
+    With counted, a tuple of (rule name, pass returning (str, substitutions))
+    for measuring (see metrics).
+    """
+    rules = []
+    if enable_default_fields:
+        rules.append(('default_fields', _replace_pass(
+            '*****', '\n'.join((*DEFAULT_FIELDS, '*****')), counted)))
+
+    rules.extend(
+        (rule[0], _regex_pass(rule, counted)) for rule, enabled in zip(
+            BASIC_REGEXES, (enable_char_capitalization, enable_whitespace_cleanup)
+        ) if enabled
+    )
+
+    # Handle replacements
+    if enable_replacements:
+        replacements = (
+            REPLACEMENTS.items() if enable_replacements is True 
+            else [(k, REPLACEMENTS[k]) for k in enable_replacements]
+        )
+        rules.extend((old, _replace_pass(old, new, counted)) for old, new in replacements)
+
+    # Handle regexes
+    if enable_regexes:
+        regexes = (
+            TIDYING_REGEXES if enable_regexes is True
+            else [r for r in TIDYING_REGEXES if r[0] in enable_regexes]
+        )
+        rules.extend((rule[0], _regex_pass(rule, counted)) for rule in regexes)
+
+    if counted:
+        return tuple(rules)
+    return tuple(run for _, run in rules)
+
+
+def _tidy_measured(mess: str, config: tuple, stats: Metrics) -> str:
+    """tidy_text that adds time, sizes and substitutions per rule to stats."""
+    start = time.perf_counter()
+    bytes_in = previous = metrics.size(mess)
+    for name, run in compile_rules(*config, counted=True):
+        rule_start = time.perf_counter()
+        mess, substitutions = run(mess)
+        seconds = time.perf_counter() - rule_start
+        bytes_out = metrics.size(mess) if substitutions else previous
+        stats.add(f'tidy:{name}', seconds, previous, bytes_out, substitutions)
+        previous = bytes_out
+    stats.add('tidy', time.perf_counter() - start, bytes_in, previous)
+    return mess
 
 
 def tidy_text(
@@ -27,89 +176,314 @@ def tidy_text(
         enable_replacements: True for all, False for none, or list of specific things to replace
         enable_regexes: True for all, False for none, or list of regex IDs (e.g., ['#210', '#215'])
     """
-    
-    # ===== Configuration =====
-    DEFAULT_FIELDS = (
-        '#920: PAZK', 
-        '#610: ЭБС АЙБУКС',
-        '#900: ^Tl',
-        '#182: ^Ab',
-        '#181: ^Ai'
+    config = (
+        enable_default_fields,
+        enable_char_capitalization,
+        enable_whitespace_cleanup,
+        enable_replacements if isinstance(enable_replacements, bool) else tuple(enable_replacements),
+        enable_regexes if isinstance(enable_regexes, bool) else tuple(enable_regexes),
     )
-    
-    REPLACEMENTS: Dict[str, str] = {
-        '&quot;': '"',
-        '&amp;': '&',
-        '#856: ^U': '#951: ^I'
-    }
-    
-    # Format: (unique_id, pattern, replacement)
-    TIDYING_REGEXES = [
-        ('#210', re.compile(r'(?<=#210\: )\^C(.+)\^C'), r'^C\1\n#210: ^C\''),
-        ('#215', re.compile(r'(?<=#215\: )\^A(\d+) с\.'), r'^A\1\''),
-        ('publisher', re.compile(r'\^(.)Издательство \"(.+)\"'), r'\1\2'),
-        ('company', re.compile(r'(?:ООО|АО) \"(.+)\"'), r'\1'),
-        ('ebook_link', re.compile(r'(#951\: \^Ihttps\:\/\/ibooks\.ru\/bookshelf\/\d+)(?:\^Z.+$)*?'), 
-         r'\1^TСсылка на документ в ЭБС Айбукс^H05^4для автор. пользователей'),
-        ('cover_link', re.compile(r'(#951\: \^Ihttps\:\/\/ibooks\.ru\/resize\/w188\/images\/T\/.+)'), 
-         r'\1^TОбложка^H02'),
-        ('initials', re.compile(r'(.)\.(.)\.'), r'\1. \2.')
+    if metrics.current is not None:
+        return _tidy_measured(mess, config, metrics.current)
+    for run in compile_rules(*config):
+        mess = run(mess)
+    return mess
+
+
+# ===== Caching =====
+CACHE_BATCH = 1024  # records looked up in the cache at once
+
+
+def ruleset_version(options: dict) -> bytes:
+    """Fingerprint of the rules a configuration runs: changes with the tables or options."""
+    rules = [
+        (unique_id, pattern.pattern, getattr(replacement, '__qualname__', replacement))
+        for unique_id, pattern, replacement in (*BASIC_REGEXES, *TIDYING_REGEXES)
     ]
+    fingerprint = repr((
+        RULESET_VERSION, DEFAULT_FIELDS, REPLACEMENTS, rules, sorted(options.items())
+    ))
+    return hashlib.blake2b(fingerprint.encode(), digest_size=16).digest()
 
-    # ===== Processing =====
-    if enable_default_fields:
-        mess = mess.replace('*****', '\n'.join((*DEFAULT_FIELDS, '*****')))
-    
-    if enable_char_capitalization:
-        mess = re.sub(r'(?<=\^)([a-zа-я])', lambda m: m.group(1).upper(), mess)
-    
-    if enable_whitespace_cleanup:
-        mess = re.sub(r' {2,}', ' ', mess)
-    
-    # Handle replacements
-    if enable_replacements:
-        replacements = (
-            REPLACEMENTS.items() if enable_replacements is True 
-            else [(k, REPLACEMENTS[k]) for k in enable_replacements]
-        )
-        for old, new in replacements:
-            mess = mess.replace(old, new)
-    
-    # Handle regexes
-    if enable_regexes:
-        regexes = (
-            TIDYING_REGEXES if enable_regexes is True
-            else [r for r in TIDYING_REGEXES if r[0] in enable_regexes]
-        )
-        for _, pattern, replacement in regexes:
-            mess = pattern.sub(replacement, mess)
-    
-    return mess
 
+class TidyCache:
+    """On-disk cache of tidied records: hash of raw record + ruleset -> cleaned text.
+    Keeps at most max_entries records, least recently used ones are evicted first.
+    """
+
+    def __init__(self, path: Union[os.PathLike, str], max_entries: int = 1_000_000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = self.misses = self.evicted = 0
+        self.db = sqlite3.connect(path)
+        with self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS entries '
+                '(key BLOB PRIMARY KEY, value TEXT, used INTEGER)'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS entries_used ON entries (used)')
+        (self.tick,) = self.db.execute('SELECT COALESCE(MAX(used), 0) FROM entries').fetchone()
+        # Entries stored, at most: replaced ones are counted twice until evict counts again
+        (self.count,) = self.db.execute('SELECT COUNT(*) FROM entries').fetchone()
+
+    @staticmethod
+    def key(mess: str, ruleset: bytes) -> bytes:
+        return hashlib.blake2b(mess.encode(), digest_size=16, key=ruleset).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, str]:
+        """Cached values for the keys that are there; marks them as just used."""
+        self.tick += 1
+        marks = ','.join('?' * len(keys))
+        found = dict(self.db.execute(
+            f'SELECT key, value FROM entries WHERE key IN ({marks})', keys
+        ))
+        with self.db:
+            self.db.executemany(
+                'UPDATE entries SET used = ? WHERE key = ?',
+                ((self.tick, key) for key in found)
+            )
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: Iterable[tuple]) -> None:
+        """Store (key, value) pairs, then evict down to max_entries."""
+        with self.db:
+            self.count += self.db.executemany(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?)',
+                ((key, value, self.tick) for key, value in items)
+            ).rowcount
+        if self.count > self.max_entries:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop least recently used entries above max_entries."""
+        (self.count,) = self.db.execute('SELECT COUNT(*) FROM entries').fetchone()
+        excess = self.count - self.max_entries
+        if excess > 0:
+            with self.db:
+                self.db.execute(
+                    'DELETE FROM entries WHERE key IN '
+                    '(SELECT key FROM entries ORDER BY used LIMIT ?)', (excess,)
+                )
+            self.evicted += excess
+            self.count = self.max_entries
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0
+        return (f'Cache: {self.hits} hits, {self.misses} misses '
+                f'({rate:.1f}% hit rate), {self.evicted} evicted')
+
+    def close(self) -> None:
+        self.evict()
+        self.db.close()
 
-def tidy_iter(messes: Iterable [str]) -> List:
+
+def _open_cache(cache: Union['TidyCache', os.PathLike, str, None]) -> tuple:
+    """Return (cache, whether we opened it and have to close it)."""
+    if cache is None or isinstance(cache, TidyCache):
+        return cache, False
+    return TidyCache(cache), True
+
+
+def _tidy_cached(
+    messes: Iterable[str],
+    cache: TidyCache,
+    options: dict,
+    pool: Optional['ProcessPoolExecutor'] = None,
+) -> Iterator[tuple]:
+    """Yield (raw, tidied) strings in order, running the rules only
+    on those not in the cache.
+    """
+    ruleset = ruleset_version(options)
+    messes = iter(messes)
+    while batch := list(islice(messes, CACHE_BATCH)):
+        keys = [TidyCache.key(mess, ruleset) for mess in batch]
+        found = cache.get_many(keys)
+        misses = {key: mess for key, mess in zip(keys, batch) if key not in found}
+        if pool is not None:
+            orders = pool.map(_tidy_in_worker, misses.values(), chunksize=64)
+        else:
+            orders = (tidy_text(mess, **options) for mess in misses.values())
+        new = dict(zip(misses, orders))
+        cache.put_many(new.items())
+        found.update(new)
+        yield from ((mess, found[key]) for mess, key in zip(batch, keys))
+
+
+def _record_pieces(chunks: Iterable[str]) -> Iterator[str]:
+    """Cut record-aligned chunks into single records, each with its separator.
+    Tidying them one by one gives the same text as tidying the whole.
+    """
+    for chunk in chunks:
+        *records, rest = chunk.split(RECORD_SEPARATOR)
+        yield from (record + RECORD_SEPARATOR for record in records)
+        if rest:
+            yield rest
+
+
+# ===== Parallel processing =====
+# Chunk of text (in characters) given to a worker at once
+PARALLEL_CHUNK_SIZE = 4 << 20
+
+_worker_options: dict = {}
+
+
+def _init_worker(options: dict) -> None:
+    """Runs once per worker process: keep the options and warm up the rules."""
+    _worker_options.update(options)
+    tidy_text('', **options)
+
+
+def _tidy_in_worker(mess: str) -> str:
+    return tidy_text(mess, **_worker_options)
+
+
+def _pool(workers: int, options: dict) -> 'ProcessPoolExecutor':
+    # Imported here: multiprocessing is slow to import and only needed with workers
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=_init_worker,
+        initargs=(options,)
+    )
+
+
+def tidy_iter(
+    messes: Iterable [str],
+    workers: int = 1,
+    cache: Union[TidyCache, os.PathLike, str, None] = None,
+    **options
+) -> List:
     """Clean strings in an iterable.
     Return a list for further manipulations.
+    workers > 1 (or 0 for all cores) spreads strings over a process pool,
+    the order is kept. cache (TidyCache or its path) skips strings
+    tidied before with the same rules. options are passed to tidy_text.
     """
-    return list(tidy_text(mess) for mess in messes)
-        
+    cache, own_cache = _open_cache(cache)
+    try:
+        if workers == 1:
+            if cache is not None:
+                return [order for _, order in _tidy_cached(messes, cache, options)]
+            return list(tidy_text(mess, **options) for mess in messes)
+        with _pool(workers, options) as pool:
+            if cache is not None:
+                return [order for _, order in _tidy_cached(messes, cache, options, pool)]
+            return list(pool.map(_tidy_in_worker, messes, chunksize=64))
+    finally:
+        if cache is not None:
+            print(cache.report())
+        if own_cache:
+            cache.close()
+
+
+def _tidy_chunk_in_worker(mess: str) -> tuple:
+    order = tidy_text(mess, **_worker_options)
+    return order, order != mess
+
+
+def _tidy_file_parallel(file: Path, target: Path, workers: int, options: dict) -> bool:
+    """Clean file in record-aligned chunks on a process pool and write
+    the results in the original order. Returns True if anything changed.
+    """
+    workers = workers or os.cpu_count()
+    changed = False
+    pending = deque()
+    temp = Path(f'{target}.part')
+    with open(file, 'r', encoding='utf-8', errors='ignore') as src, \
+            open(temp, 'w', encoding='utf-8', errors='ignore') as dst, \
+            _pool(workers, options) as pool:
+        for mess in iter_record_chunks(src, PARALLEL_CHUNK_SIZE):
+            pending.append(pool.submit(_tidy_chunk_in_worker, mess))
+            # Only a couple of chunks per worker are in flight at any time
+            if len(pending) >= 2 * workers:
+                order, chunk_changed = pending.popleft().result()
+                dst.write(order)
+                changed |= chunk_changed
+        while pending:
+            order, chunk_changed = pending.popleft().result()
+            dst.write(order)
+            changed |= chunk_changed
+    if changed:
+        os.replace(temp, target)
+    else:
+        temp.unlink()
+    return changed
+
+
+def _tidy_file_cached(file: Path, target: Path, workers: int, cache: TidyCache) -> bool:
+    """Clean file record by record, taking unchanged records from the cache.
+    Returns True if anything changed.
+    """
+    changed = False
+    temp = Path(f'{target}.part')
+    with open(file, 'r', encoding='utf-8', errors='ignore') as src, \
+            open(temp, 'w', encoding='utf-8', errors='ignore') as dst:
+        messes = _record_pieces(iter_record_chunks(src))
+        pool = _pool(workers, {}) if workers != 1 else None
+        try:
+            for mess, order in _tidy_cached(messes, cache, {}, pool):
+                changed |= order != mess
+                dst.write(order)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    if changed:
+        os.replace(temp, target)
+    else:
+        temp.unlink()
+    return changed
+
+
+class NothingToTidy(ValueError):
+    """tidy_file found the text clean already and wrote nothing."""
+
 
 def tidy_file(
     file: Path,
     newfile: bool = False,
+    workers: int = 1,
+    cache: Union[TidyCache, os.PathLike, str, None] = None,
 ) -> None:
     """Read, clean and write an IRBIS text file.
     Args:
     file - source file
     new_file - save cleaned text to a separate file if True, 
     to the same file if False
+    workers - clean record-aligned chunks on that many processes
+    (0 for all cores) instead of the whole text at once
+    cache - TidyCache (or path to one): records seen before with the same
+    rules are taken from it instead of being tidied again
+    Raises NothingToTidy if cleaning changes nothing.
     """
+    target = f'{file}_cleaned.txt' if newfile else file
+    if cache is not None:
+        cache, own_cache = _open_cache(cache)
+        try:
+            changed = _tidy_file_cached(file, target, workers, cache)
+            print(cache.report())
+        finally:
+            if own_cache:
+                cache.close()
+        if not changed:
+            raise NothingToTidy(file)
+        print(f"Saved to {target}")
+        return
+
+    if workers != 1:
+        if not _tidy_file_parallel(file, target, workers, {}):
+            raise NothingToTidy(file)
+        print(f"Saved to {target}")
+        return
+
     mess = outof(file, 'to string')
     order = tidy_text(mess)
     if order == mess:
-        raise ValueError
+        raise NothingToTidy(file)
     else:
-        into((f'{file}_cleaned.txt' if newfile else file), 'from string', order)
+        into(target, 'from string', order)
 
 
 if __name__ == "__main__" and len(sys.argv) > 1:
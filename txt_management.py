@@ -1,7 +1,16 @@
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
 from transliterate import translit
 
+from .bytes_filter import drop_lines
+from .external_sort import MEMORY_BUDGET, sort_records
+from .files_together import concatenate
+from .get_text import iter_record_chunks, outof
+from .shards import split_records, split_shards, write_files
+
 
 def modify_file(filename, func):
     """Opens, changes (with func()) and closes text file."""
@@ -14,15 +23,32 @@ def modify_file(filename, func):
     print(filename)
 
 
-def modify_files(folder, func):
-    """Opens, changes (with func()) and closes all text files in folder."""
+def _modify_file(path, func):
+    with open(path, 'r', encoding='utf-8') as f:
+        text = func(f.read())
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def _map_files(func, paths, *args, workers=1):
+    """[func(path, *args) for path in paths], on a process pool
+    if workers isn't 1 (None means all CPUs)."""
+    if workers == 1:
+        return [func(path, *args) for path in paths]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(func, paths, *(repeat(arg) for arg in args)))
+
+
+def modify_files(folder, func, workers=1):
+    """Opens, changes (with func()) and closes all text files in folder.
+    With workers other than 1 files are changed in parallel processes
+    (func must then be a module-level function).
+    """
     folder = folder.replace(r'\\', '/')
-    for filename in os.listdir(folder):
-        with open(f'{folder}/{filename}', 'r', encoding='utf-8') as f:
-            text = func(f.read())
-        with open(f'{folder}/{filename}', 'w', encoding='utf-8') as f:
-            f.write(text)
-        print(filename)
+    paths = [f'{folder}/{filename}' for filename in os.listdir(folder)]
+    for path in _map_files(_modify_file, paths, func, workers=workers):
+        print(os.path.basename(path))
 
 
 def open_list(listfile, folder):
@@ -61,71 +87,63 @@ def rename_translit(folder_name, ext='pdf'):
 def join_files(folder, sep='\n', files_list=None, condition=None):
     """Joins all files in folder folder_name to one text file. 
     Inserts separating symbols between them if sep is given.
+    condition(line) -> bool keeps only some lines (the files are then
+    read record by record). Everything goes through one output handle.
     """
     if files_list is None:
         files_list = os.listdir(folder)
-    for elem in files_list:
-        with open(
-                os.path.normpath(os.path.join(folder, elem)), "r", 
-                encoding="utf-8", errors='ignore'
-                ) as f:
-            if condition:
-                single_file = ''.join([
-                line for line in f.readlines() if condition
-                ])
-            else: single_file = f.read()
-                    
-        with open(f'{folder}.txt', 'a', encoding="utf-8") as alltogether:
-            alltogether.write(single_file)
-            alltogether.write(sep)
+    paths = (os.path.normpath(os.path.join(folder, elem)) for elem in files_list)
+    if condition:
+        def record_filter(record):
+            return '\n'.join(line for line in record.splitlines() if condition(line))
+        concatenate(paths, f'{folder}.txt', record_filter, sep.encode('utf-8'), mode='ab')
+    else:
+        concatenate(paths, f'{folder}.txt', sep=sep.encode('utf-8'), mode='ab')
 
 
-def split_file(filename, sep='\n*****', keepsep=True):
-    """Separates file into a folder (named like the file) of small files.
-    If keepsep is True then the sep is included into the files.
+def split_file(
+        filename, sep='\n*****', keepsep=True,
+        output_dir=None, shards=None, workers=4):
+    """Separates file into a folder (output_dir, by default named like
+    the file) of small files. If keepsep is True then the sep is included
+    into the files.
+    With shards=N makes N files of about the same size instead,
+    cut between records, and a manifest to join them back
+    (see shards.join_shards).
     """
-    with open(filename, 'r', encoding="utf-8", errors='ignore') as f:
-        many_files = f.read().split(sep)
-        counter_length = len(str(len(many_files)))
-        for i, elem in enumerate(many_files):
-            counter = str(i).rjust(counter_length, '0')
-            with open(
-                    f'c:/irbiswrk/{filename}/{counter}.txt',
-                    'w', encoding="utf-8"
-                    ) as f:
-                f.write(elem)
-                if keepsep: f.write(sep)
+    if shards:
+        return split_shards(filename, shards, output_dir, workers)
+    return split_records(filename, output_dir, sep, keepsep, workers)
     
 
+def summary_fields(record):
+    """Keep #010, #200, #215, #330 and #210 of a record and tidy them."""
+    single_file = '\n'.join(
+        line for line in record.splitlines()
+        if re.match(r"#010:|#200:|#215:|#330:|#210:", line))
+    single_file = re.sub(
+        r'#210: \^C(.+)\^C',
+        r'#210: ^C\1\n#210: ^C',
+        single_file)
+    single_file = re.sub(
+        r'#215: \^A(\d+) с.',
+        r'#215: ^A\1',
+        single_file)
+    single_file = re.sub(
+        r'\^(.)Издательство \"(.+)\"',
+        r'^\1\2',
+        single_file)
+    single_file = re.sub(
+        r'(?:ООО|АО) \"(.+)\"',
+        r'\1',
+        single_file)
+    return single_file
+
+
 def files_together(folder_name):
-    for elem in os.listdir(folder_name):
-        with open(
-                f'{folder_name}/{elem}',
-                "r", encoding="utf-8", errors='ignore'
-                ) as f:
-            single_file = ''.join([
-                    line for line in f.readlines() if bool(re.match(
-                    r"#010:|#200:|#215:|#330:|#210:|\*\*\*\*\*",
-                    line))])
-            single_file = re.sub(
-                r'#210: \^C(.+)\^C',
-                r'#210: ^C\1\n#210: ^C',
-                single_file)
-            single_file = re.sub(
-                r'#215: \^A(\d+) с.',
-                r'#215: ^A\1',
-                single_file)
-            single_file = re.sub(
-                r'\^(.)Издательство \"(.+)\"',
-                r'^\1\2',
-                single_file)
-            single_file = re.sub(
-                r'(?:ООО|АО) \"(.+)\"',
-                r'\1',
-                single_file)
-                    
-        with open(f'{folder_name}.txt', 'a', encoding="utf-8") as alltogether:
-            alltogether.write(single_file)
+    concatenate(
+        (f'{folder_name}/{elem}' for elem in os.listdir(folder_name)),
+        f'{folder_name}.txt', summary_fields, mode='ab')
 
 
 def els_files_together(folder_name):
@@ -177,52 +195,36 @@ def els_files_together(folder_name):
         with open(f'{folder_name}.txt', 'a', encoding="utf-8") as alltogether:
             alltogether.write(single_file)
 
-def remove_fields(files_list, field='#953:'):
+def remove_fields(files_list, field='#953:', folder='c:/irbiswrk'):
+    """Drops lines of the field, working on bytes (see bytes_filter)."""
     print('Удаляем ненужные поля...')
 
     for filename in files_list:
-        with open(
-            f'c:\irbiswrk\{filename}',
-            'r', encoding="utf-8", errors='ignore') as f:
-            text = f.readlines()
-            selected_lines = [line for line in text if field not in line]
-
-        with open(
-            f'c:\irbiswrk\{filename}',
-            'w',  encoding="utf-8", errors='ignore') as f:
-            f.writelines(selected_lines)
-            print(f'{filename} обработан!')
+        drop_lines(f'{folder}/{filename}', (field,))
+        print(f'{filename} обработан!')
         
     print('Готово')
 
 
-def sort_fields(files_list):
-    """for comparing text files"""
+def sort_fields(
+        files_list, folder='c:/irbiswrk',
+        exclude=('#907:', '#910:', '#999:'), budget=MEMORY_BUDGET):
+    """for comparing text files
+    Records are sorted in bounded memory (see external_sort.sort_records).
+    """
     print('Выполняется сортировка...')
 
     for filename in (files_list):
         with open(
-                f'c:\irbiswrk\{filename}',
-                'r', encoding="utf-8", errors='ignore'
-                ) as f:
-            text = f.read()
-            entries = text.split('*****')
-            sorted_entries = []
-            for eachentry in entries:
-                selected_lines = [
-                line for line in eachentry.splitlines() if all((
-                    bool('#907:' not in line), 
-                    bool('#910:' not in line), 
-                    bool('#999:' not in line)
-                ))]
-                sorted_entries.append("\r\n".join(sorted(selected_lines)))
-                sorted_entries = sorted(sorted_entries)
-
-        with open(
-                f'c:\irbiswrk\sorted_{filename}',
+                f'{folder}/sorted_{filename}',
                 'w',  encoding="utf-8", errors='ignore'
                 ) as f:
-            f.write('\r\n*****'.join(sorted_entries))
+            entries = outof(f'{folder}/{filename}', 'iter records')
+            for i, entry in enumerate(
+                    sort_records(entries, exclude, sep='\r\n', budget=budget)):
+                if i:
+                    f.write('\r\n*****\r\n')
+                f.write(entry)
             print(f'{filename} отсортирован!')
         
     print('Готово')
@@ -244,47 +246,91 @@ def get_330(folder_name):
                         if line[:5] in to_save:
                             alltogether.write(line)
     
+SUBFIELD = re.compile(r'(\^[^\n])([^^\n]+)')
+SENTENCE_START = re.compile(r'(?<=\. )(.)')
+ROMAN_NUMBER = re.compile(r'\b[IVXivx]+\b')
+
+
 def uncapslock(phrase):
     """Like built-in capitalize() but for multi-sentence texts:
     keep uppercase letters after periods. Does not work if there are
-    digits in the phrase.
+    digits in the phrase. Phrases not in all caps are returned as they are.
     """
-    if phrase.isupper():
-        new = phrase.capitalize()
-        if '. ' in new:
-            new = re.sub(
-                r'(?<=\. )(.)', 
-                lambda m: m.group(1).upper(), 
-                new)
-        if new != phrase:
-            print(f'{phrase} > {new}')
+    if not phrase.isupper():
+        return phrase
+    new = phrase.capitalize()
+    if '. ' in new:
+        new = SENTENCE_START.sub(lambda m: m.group(1).upper(), new)
     """return Roman numbers to uppercase"""
-    new = re.sub(
-        r'(\b[IVXivx]+\b)',
-        lambda m: m.group(1).upper(), 
-        new)
-
-    return new            
-
-
-def uncapslock_fields(txt):
-    fields = re.findall(
-        r'(?<=\^.)(.+?)(?=\^|\n)',
-        txt)
-    for field in fields:
-        if field.isupper():
-            new = uncapslock(field)
-            txt = txt.replace(field, new)
-    return txt
-    
-    
-def split_irbis_entries(txt):
+    new = ROMAN_NUMBER.sub(lambda m: m.group(0).upper(), new)
+    return new
+
+
+def uncapslock_fields(txt, changes=None):
+    """uncapslock every all-caps subfield in one pass over txt.
+    Each subfield is changed where it is, other places with the same
+    text are not touched. (old, new) pairs are appended to changes if given.
+    """
+    def fix(match):
+        value = match.group(2)
+        new = uncapslock(value)
+        if new == value:
+            return match.group(0)
+        if changes is not None:
+            changes.append((value, new))
+        return match.group(1) + new
+    return SUBFIELD.sub(fix, txt)
+
+
+def uncapslock_records(records, changes=None):
+    """Streaming mode: records (e.g. outof(file, 'iter records')) one by one."""
+    for record in records:
+        yield uncapslock_fields(record, changes)
+
+
+def uncapslock_file(filename, newfile=None, changes=None):
+    """uncapslock_fields for a file read in record-aligned chunks.
+    Writes to newfile or back to filename. Returns the list of changes.
+    """
+    changes = [] if changes is None else changes
+    target = newfile or filename
+    temp = f'{target}.part'
+    with open(filename, 'r', encoding='utf-8', errors='ignore', newline='') as src, \
+            open(temp, 'w', encoding='utf-8', newline='') as dst:
+        for chunk in iter_record_chunks(src):
+            dst.write(uncapslock_fields(chunk, changes))
+    os.replace(temp, target)
+    return changes
+
+
+def uncapslock_folder(folder, workers=None, report=None):
+    """uncapslock_file for every file in folder, files in parallel.
+    Returns {filename: [(old, new), ...]}; with report (a path)
+    the changes are also saved there as 'file<TAB>old<TAB>new' lines.
+    """
+    names = sorted(os.listdir(folder))
+    paths = [os.path.join(folder, filename) for filename in names]
+    changed = dict(zip(names, _map_files(uncapslock_file, paths, workers=workers)))
+    for filename, changes in changed.items():
+        print(f'{filename}: {len(changes)}')
+    if report:
+        with open(report, 'w', encoding='utf-8') as f:
+            for filename, changes in changed.items():
+                for old, new in changes:
+                    f.write(f'{filename}\t{old}\t{new}\n')
+    return changed
+
+
+def split_irbis_entries(txt, output_dir='.', workers=4):
+    """One file per entry, named by its title (#200^A)."""
+    folder = Path(output_dir)
+    folder.mkdir(parents=True, exist_ok=True)
     entries = txt.split('\n*****\n')
-    for entry in entries:
-        name = entry[entry.find('#200: ^A')+8:entry.find('^F')]
-        with open(f'c:\irbiswrk\{name}.txt', 'w') as f:
-            f.write(entry)
-            f.write('\n*****')
+    write_files((
+        (folder / f"{entry[entry.find('#200: ^A')+8:entry.find('^F')]}.txt",
+         f'{entry}\n*****'.encode('utf-8'))
+        for entry in entries
+    ), workers)
 
 
 def trim_itf(txt):
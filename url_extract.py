@@ -0,0 +1,85 @@
+import os
+import re
+from array import array
+from typing import Dict, Iterable, Iterator, List, Literal, Union
+
+from .get_text import outof
+from .link_checker import normalize_url
+
+
+URL_PATTERN = re.compile(
+    r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[/?#][-\w./?%&=:#@]*'
+)
+
+
+class UrlIndex:
+    """Unique links (by normalize_url) with the numbers of records they came from.
+    Each link is kept once as first seen, record numbers go into compact arrays.
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self.urls: List[str] = []
+        self.sources: List[array] = []
+        self.found = 0  # occurrences, duplicates included
+
+    def add(self, url: str, record: int) -> None:
+        self.found += 1
+        key = normalize_url(url)
+        i = self._ids.get(key)
+        if i is None:
+            i = self._ids[key] = len(self.urls)
+            self.urls.append(url)
+            self.sources.append(array('I'))
+        sources = self.sources[i]
+        if not sources or sources[-1] != record:
+            sources.append(record)
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.urls)
+
+    def records(self, url: str) -> List[int]:
+        """Numbers of records where any spelling of url occurs."""
+        i = self._ids.get(normalize_url(url))
+        return [] if i is None else list(self.sources[i])
+
+    def spread(self, results: Iterable) -> Dict[int, list]:
+        """Map results (one per unique link, in self.urls order) back to records."""
+        by_record: Dict[int, list] = {}
+        for sources, result in zip(self.sources, results):
+            for record in sources:
+                by_record.setdefault(record, []).append(result)
+        return by_record
+
+
+def _pieces(
+    file: Union[os.PathLike, str],
+    by: Literal['records', 'lines']
+) -> Iterable[str]:
+    if not os.path.isfile(file):
+        # Text given instead of a file
+        return str(file).split('*****') if by == 'records' else str(file).splitlines()
+    if by == 'records':
+        return outof(file, 'iter records')
+    return open(file, 'r', encoding='utf-8', errors='ignore')
+
+
+def extract(
+    file: Union[os.PathLike, str],
+    by: Literal['records', 'lines'] = 'records',
+    pattern: re.Pattern = URL_PATTERN
+) -> UrlIndex:
+    """Collect unique links from a file read one record (or line) at a time."""
+    index = UrlIndex()
+    pieces = _pieces(file, by)
+    try:
+        for number, piece in enumerate(pieces):
+            for url in pattern.findall(piece):
+                index.add(url, number)
+    finally:
+        if hasattr(pieces, 'close'):
+            pieces.close()
+    return index